@@ -0,0 +1,258 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from main import Game
+from simulate import board_settings
+
+
+class BatchGrid:
+    EMPTY = 0
+    DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+    # Initialize a batch of boards as one int8 array where 0 is a blank cell and 1 or 2 is a player's symbol
+    def __init__(self, batch_size, row_count, column_count, consecutive_win_length, gravity_enabled):
+        self.batch_size = batch_size
+        self.row_count = row_count
+        self.column_count = column_count
+        self.win_length = consecutive_win_length
+        self.gravity_enabled = bool(gravity_enabled)
+        self.cells = np.zeros((batch_size, row_count, column_count), dtype=np.int8)
+        self.column_heights = np.zeros((batch_size, column_count), dtype=np.int16)
+        self.move_counts = np.zeros(batch_size, dtype=np.int32)
+
+    # Reset each cell of every board to be empty
+    def reset(self):
+        self.cells.fill(self.EMPTY)
+        self.column_heights.fill(0)
+        self.move_counts.fill(0)
+
+    # Return a new batch holding copies of the given boards, e.g. the boards whose games have not finished
+    def select_boards(self, board_indices):
+        batch = BatchGrid(len(board_indices), self.row_count, self.column_count, self.win_length, self.gravity_enabled)
+        batch.cells[:] = self.cells[board_indices]
+        batch.column_heights[:] = self.column_heights[board_indices]
+        batch.move_counts[:] = self.move_counts[board_indices]
+        return batch
+
+    # Copy a scalar grid into one board of the batch, mapping the given two symbols to players 1 and 2
+    def load_grid(self, board_index, grid, symbols):
+        self.cells[board_index] = self.EMPTY
+        for row_index, column_index, symbol in grid.move_stack:
+            self.cells[board_index, row_index, column_index] = symbols.index(symbol) + 1
+        self.column_heights[board_index] = grid.column_heights
+        self.move_counts[board_index] = grid.move_count
+
+    # Return a boolean array of the cells of each board that are a legal move
+    def legal_mask(self):
+        blank = self.cells == self.EMPTY
+        if not self.gravity_enabled:
+            return blank
+        # With gravity, only the lowest blank cell of each column can be played
+        landing_rows = self.row_count - 1 - self.column_heights
+        return blank & (np.arange(self.row_count)[None, :, None] == landing_rows[:, None, :])
+
+    # Return a boolean array of the boards on which every cell has been occupied, i.e., a tie has occurred
+    def is_full(self):
+        return self.move_counts == self.row_count * self.column_count
+
+    # Place each board's player in the given cell, or in the given column's lowest blank cell if gravity is enabled
+    # Return the row indices that the symbols were placed in
+    def apply_moves(self, board_indices, row_indices, column_indices, players):
+        if self.gravity_enabled:
+            row_indices = self.row_count - 1 - self.column_heights[board_indices, column_indices]
+        self.cells[board_indices, row_indices, column_indices] = players
+        self.column_heights[board_indices, column_indices] += 1
+        self.move_counts[board_indices] += 1
+        return row_indices
+
+    # Return the row and column slices that hold the j-th cell of every winning line in a direction
+    # Lines are indexed by their first cell, offset by win length - 1 columns for lines running to the left
+    def line_slices(self, row_step, column_step, j):
+        line_rows = self.row_count - (self.win_length - 1) * abs(row_step)
+        line_columns = self.column_count - (self.win_length - 1) * abs(column_step)
+        column_offset = self.win_length - 1 if column_step < 0 else 0
+        row_start = j * row_step
+        column_start = column_offset + j * column_step
+        return slice(row_start, row_start + line_rows), slice(column_start, column_start + line_columns)
+
+    # Return true if a board geometry has winning lines in a direction
+    def has_lines(self, row_step, column_step):
+        return (self.row_count - (self.win_length - 1) * abs(row_step) > 0
+                and self.column_count - (self.win_length - 1) * abs(column_step) > 0)
+
+    # Return an array for each direction of the winning lines that are completely filled by the given stones
+    def filled_lines(self, stones):
+        filled = []
+        for row_step, column_step in self.DIRECTIONS:
+            if not self.has_lines(row_step, column_step):
+                filled.append(None)
+                continue
+            lines = stones[(slice(None),) + self.line_slices(row_step, column_step, 0)].copy()
+            for j in range(1, self.win_length):
+                lines &= stones[(slice(None),) + self.line_slices(row_step, column_step, j)]
+            filled.append(lines)
+        return filled
+
+    # Return a boolean array of the boards on which placing each board's player in the given cell completes a line
+    # This matches 'Grid.has_victory', which treats the given cell as holding the symbol whatever it contains
+    def has_victory(self, row_indices, column_indices, players):
+        board_indices = np.arange(self.batch_size)
+        stones = self.cells == np.asarray(players, dtype=np.int8).reshape(-1, 1, 1)
+        stones[board_indices, row_indices, column_indices] = True
+        victories = np.zeros(self.batch_size, dtype=bool)
+        for (row_step, column_step), lines in zip(self.DIRECTIONS, self.filled_lines(stones)):
+            if lines is None:
+                continue
+            column_offset = self.win_length - 1 if column_step < 0 else 0
+            # Look up every line that would contain the given cell as its j-th cell
+            for j in range(self.win_length):
+                line_row_indices = row_indices - j * row_step
+                line_column_indices = column_indices - j * column_step - column_offset
+                valid = ((line_row_indices >= 0) & (line_row_indices < lines.shape[1])
+                         & (line_column_indices >= 0) & (line_column_indices < lines.shape[2]))
+                victories |= valid & lines[board_indices, np.where(valid, line_row_indices, 0),
+                                           np.where(valid, line_column_indices, 0)]
+        return victories
+
+    # Return a boolean array of the blank cells in which each board's player would complete a line
+    def winning_cells(self, players):
+        stones = (self.cells == np.asarray(players, dtype=np.int8).reshape(-1, 1, 1)).astype(np.int16)
+        blank = self.cells == self.EMPTY
+        winning = np.zeros(self.cells.shape, dtype=bool)
+        for row_step, column_step in self.DIRECTIONS:
+            if not self.has_lines(row_step, column_step):
+                continue
+            slices = [(slice(None),) + self.line_slices(row_step, column_step, j) for j in range(self.win_length)]
+            # A line is one move from completion if it holds win length - 1 stones and a single blank cell
+            stone_counts = sum(stones[cells] for cells in slices)
+            blank_counts = sum(blank[cells].astype(np.int16) for cells in slices)
+            almost_filled = (stone_counts == self.win_length - 1) & (blank_counts == 1)
+            for cells in slices:
+                winning[cells] |= almost_filled & blank[cells]
+        return winning
+
+    # Return a boolean array of the blank cells of lines held only by each board's player that are two short of a win
+    # These are the cells in which the player could create a new winning cell, as in 'Grid.threat_cells'
+    def threat_cells(self, players):
+        stones = (self.cells == np.asarray(players, dtype=np.int8).reshape(-1, 1, 1)).astype(np.int16)
+        blank = self.cells == self.EMPTY
+        threats = np.zeros(self.cells.shape, dtype=bool)
+        for row_step, column_step in self.DIRECTIONS:
+            if not self.has_lines(row_step, column_step) or self.win_length < 2:
+                continue
+            slices = [(slice(None),) + self.line_slices(row_step, column_step, j) for j in range(self.win_length)]
+            stone_counts = sum(stones[cells] for cells in slices)
+            blank_counts = sum(blank[cells].astype(np.int16) for cells in slices)
+            almost_open = (stone_counts == self.win_length - 2) & (blank_counts == 2)
+            for cells in slices:
+                threats[cells] |= almost_open & blank[cells]
+        return threats
+
+    # Return a boolean array of the legal moves after which each board's player has at least two legal winning moves
+    # Each candidate move is played on its own copy of its board in a second batch, so that every candidate is checked
+    # at once, as in 'Grid.double_threat_moves'
+    def double_threat_cells(self, players):
+        players = np.asarray(players, dtype=np.int8)
+        candidates = self.threat_cells(players) & self.legal_mask()
+        board_indices, row_indices, column_indices = np.nonzero(candidates)
+        double_threats = np.zeros(self.cells.shape, dtype=bool)
+        if not len(board_indices):
+            return double_threats
+        trials = self.select_boards(board_indices)
+        trials.apply_moves(np.arange(trials.batch_size), row_indices, column_indices, players[board_indices])
+        winning_counts = (trials.winning_cells(players[board_indices]) & trials.legal_mask()).sum(axis=(1, 2))
+        double_threats[board_indices, row_indices, column_indices] = winning_counts > 1
+        return double_threats
+
+
+# Return a random candidate cell of each board and whether the board has any candidate at all
+def random_cells(candidates, rng):
+    batch_size, row_count, column_count = candidates.shape
+    flat_candidates = candidates.reshape(batch_size, -1)
+    keys = np.where(flat_candidates, rng.random(flat_candidates.shape), -1.0)
+    cell_indices = keys.argmax(axis=1)
+    return cell_indices // column_count, cell_indices % column_count, flat_candidates.any(axis=1)
+
+
+# Select a move on every board for the given players following the rules of 'CPU.select_move': a hard player wins if
+# it can, blocks the opponent's win otherwise, then creates two winning moves at once, then prevents the opponent from
+# creating two winning moves at once, and plays a random legal move if none of these exists
+# Return row indices, column indices, and whether each move wins the game
+def select_moves(batch, players, hard, rng):
+    legal = batch.legal_mask()
+    winning = batch.winning_cells(players) & legal
+    row_indices, column_indices, _ = random_cells(legal, rng)
+    hard_indices = np.flatnonzero(hard)
+    if len(hard_indices):
+        # The rules are only evaluated on copies of the boards of hard players
+        hard_batch = batch.select_boards(hard_indices)
+        hard_players = players[hard_indices]
+        # Rules are applied from the lowest priority to the highest, so each overrides the ones before it
+        for cells in (hard_batch.double_threat_cells(3 - hard_players), hard_batch.double_threat_cells(hard_players),
+                      hard_batch.winning_cells(3 - hard_players) & legal[hard_indices], winning[hard_indices]):
+            rule_rows, rule_columns, can_apply = random_cells(cells, rng)
+            row_indices[hard_indices[can_apply]] = rule_rows[can_apply]
+            column_indices[hard_indices[can_apply]] = rule_columns[can_apply]
+    wins = winning[np.arange(batch.batch_size), row_indices, column_indices]
+    return row_indices, column_indices, wins
+
+
+# Play one game on every board of a batch between two easy or hard levels with random first players
+# Moves are only selected on copies of the boards whose games have not finished
+# Return the winning player (1, 2, or 0 for a tie) and move count of each board
+def play_batch(batch, levels, rng):
+    batch.reset()
+    players = rng.integers(1, 3, batch.batch_size).astype(np.int8)
+    hard_players = np.array([False] + [Game.CPU_LEVELS.index(level) > 0 for level in levels])
+    winners = np.zeros(batch.batch_size, dtype=np.int8)
+    active = np.ones(batch.batch_size, dtype=bool)
+    while active.any():
+        board_indices = np.flatnonzero(active)
+        active_players = players[board_indices]
+        row_indices, column_indices, wins = select_moves(batch.select_boards(board_indices), active_players,
+                                                         hard_players[active_players], rng)
+        batch.apply_moves(board_indices, row_indices, column_indices, active_players)
+        winners[board_indices[wins]] = active_players[wins]
+        active[board_indices[wins]] = False
+        active &= ~batch.is_full()
+        players = 3 - players
+    return winners, batch.move_counts.copy()
+
+
+# Parse the command line, play batches of games, and report throughput and results as JSON
+def main():
+    parser = argparse.ArgumentParser(description="Play many easy or hard CPU games at once with NumPy.")
+    parser.add_argument("--levels", nargs=2, choices=["easy", "hard"], default=["easy", "hard"])
+    board = parser.add_mutually_exclusive_group()
+    board.add_argument("--mode", choices=[mode for mode in Game.BOARD_MODES if mode != "custom"],
+                       default="tic-tac-toe")
+    board.add_argument("--board", type=int, nargs=4, metavar=("HEIGHT", "WIDTH", "WIN_LENGTH", "GRAVITY"))
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--seed", type=int)
+    arguments = parser.parse_args()
+    settings = board_settings(arguments.mode, arguments.board)
+    batch = BatchGrid(arguments.batch_size, *settings)
+    rng = np.random.default_rng(arguments.seed)
+    results = np.zeros(3, dtype=np.int64)
+    move_count = 0
+    start = time.perf_counter()
+    for _ in range(arguments.batches):
+        winners, move_counts = play_batch(batch, arguments.levels, rng)
+        results += np.bincount(winners, minlength=3)
+        move_count += int(move_counts.sum())
+    elapsed = time.perf_counter() - start
+    game_count = arguments.batch_size * arguments.batches
+    json.dump({"games": game_count, "moves": move_count, "seconds": elapsed,
+               "games_per_second": game_count / elapsed, "moves_per_second": move_count / elapsed,
+               "win_rate": results[1] / game_count, "loss_rate": results[2] / game_count,
+               "tie_rate": results[0] / game_count}, sys.stdout)
+    print()
+
+
+if __name__ == "__main__":
+    main()
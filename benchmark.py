@@ -0,0 +1,210 @@
+import argparse
+import contextlib
+import functools
+import io
+import json
+import platform
+import random
+import sys
+import time
+
+from main import Game, create_cpu, create_grid
+
+CUSTOM_BOARD_SETTINGS = [(12, 12, 5, 0), (19, 19, 5, 0), (10, 12, 5, 1)]
+WIN_CHECKS = ["is_horizontal_win", "is_vertical_win", "is_left_diagonal_win", "is_right_diagonal_win"]
+# Fewest calls of a win check in each measurement; the checks of small boards are repeated to reach it
+MIN_CHECK_CALLS = 20000
+
+
+# Return the name of a board used in result keys, e.g. '6x7x4g' for a 6 by 7 board, win length 4, with gravity
+def board_name(settings):
+    height, width, win_length, gravity_enabled = settings
+    return f"{height}x{width}x{win_length}" + ("g" if gravity_enabled else "")
+
+
+# Return the grids of random positions without a win, each filled to the given fraction, for a board and seed
+def random_positions(settings, position_count, fill_fraction, seed, backend="list"):
+    rng = random.Random(f"{board_name(settings)},{seed}")
+    positions = []
+    for _ in range(position_count):
+        grid = create_grid(*settings, backend)
+        move_count = int(len(grid.rows) * len(grid.columns) * fill_fraction)
+        while grid.move_count < move_count:
+            symbol = Game.SYMBOL_DEFAULTS[grid.move_count % 2]
+            moves = [move for move in grid.legal_moves() if not grid.has_victory(*move, symbol)]
+            if not moves:
+                break
+            grid.make_move(*rng.choice(sorted(moves)), symbol)
+        positions.append(grid)
+    return positions
+
+
+# Return the fewest seconds per call over a number of repeats of calling each function in a list
+def seconds_per_call(calls, repeat_count):
+    best = float("inf")
+    for _ in range(repeat_count):
+        start = time.perf_counter()
+        for call in calls:
+            call()
+        best = min(best, time.perf_counter() - start)
+    return best / len(calls)
+
+
+# Return the fewest seconds of a fixed pure Python workload, used to scale results to the speed of the machine
+def calibration_seconds(repeat_count):
+    return seconds_per_call([functools.partial(calibration_workload, 200000)], repeat_count)
+
+
+# Add and look up integers in a dictionary and list, a workload similar to the grid operations
+def calibration_workload(count):
+    table = {}
+    values = []
+    for value in range(count):
+        table[value % 1000] = table.get(value % 1000, 0) + value
+        values.append(value)
+    return len(values) + len(table)
+
+
+# Return the microseconds per call of each grid operation on a board's positions as a dictionary
+def grid_benchmarks(settings, positions, repeat_count):
+    results = {}
+    cells = [(grid, row_index, column_index, symbol) for grid in positions for row_index, column_index in
+             grid.legal_moves() for symbol in Game.SYMBOL_DEFAULTS]
+    # Cheap calls are repeated so that each measurement is long enough to be stable
+    call_count = max(1, -(-MIN_CHECK_CALLS // max(1, len(cells))))
+    for method_name in ["has_victory"] + WIN_CHECKS:
+        checks = [(getattr(grid, method_name), row_index, column_index, symbol)
+                  for grid, row_index, column_index, symbol in cells]
+        results[method_name] = seconds_per_call([functools.partial(call_checks, checks, call_count)],
+                                                repeat_count) / max(1, len(checks) * call_count)
+    results["legal_moves"] = seconds_per_call([grid.legal_moves for grid in positions] * 20, repeat_count)
+    results["is_full"] = seconds_per_call([grid.is_full for grid in positions] * 100, repeat_count)
+    # Replay the moves of every position on one grid, so each call is one symbol added and 'reset' ends each game
+    grid = create_grid(*settings)
+    games = [[(row_index, column_index) for row_index, column_index, _ in position.move_stack]
+             for position in positions]
+    move_count = max(1, sum(len(moves) for moves in games))
+    results["add_symbol_reset"] = seconds_per_call([functools.partial(replay_moves, grid, games)],
+                                                   repeat_count) / move_count
+    return {operation: seconds * 1e6 for operation, seconds in results.items()}
+
+
+# Call each check on its cell and symbol, a number of times over
+def call_checks(checks, call_count):
+    for _ in range(call_count):
+        for check, row_index, column_index, symbol in checks:
+            check(row_index, column_index, symbol)
+
+
+# Add the moves of each game to a grid with 'add_symbol' and reset the grid after each game
+def replay_moves(grid, games):
+    for moves in games:
+        for move_index, (row_index, column_index) in enumerate(moves):
+            grid.add_symbol(row_index, column_index, Game.SYMBOL_DEFAULTS[move_index % 2])
+        grid.reset()
+
+
+# Return the seconds of a turn of a new CPU player of a level on a grid
+# Strong levels are limited by work rather than time, so that their latency is comparable between runs
+def time_cpu_turn(grid, level, node_limit, playout_limit, seed):
+    cpu = create_cpu(Game.CPU_LEVELS.index(level), "benchmark", Game.SYMBOL_DEFAULTS[grid.move_count % 2])
+    cpu.rng = random.Random(seed)
+    if cpu.search is not None:
+        cpu.search.time_limit = float("inf")
+        cpu.search.node_limit = node_limit
+    if hasattr(cpu, "playout_limit"):
+        cpu.time_limit = float("inf")
+        cpu.playout_limit = playout_limit
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        cpu.take_turn(grid)
+        elapsed = time.perf_counter() - start
+    cpu.close()
+    return elapsed
+
+
+# Return the mean over a board's positions of the fewest milliseconds of a CPU turn of each level as a dictionary
+def cpu_benchmarks(positions, levels, node_limit, playout_limit, seed, repeat_count):
+    results = {}
+    for level in levels:
+        elapsed = sum(min(time_cpu_turn(grid, level, node_limit, playout_limit, seed) for _ in range(repeat_count))
+                      for grid in positions)
+        results[f"take_turn_{level.replace(' ', '_')}"] = elapsed / len(positions) * 1e3
+    return results
+
+
+# Run every benchmark on every board; return dictionary of results keyed by 'board/operation'
+def run_benchmarks(boards, arguments):
+    results = {}
+    for settings in boards:
+        positions = random_positions(settings, arguments.positions, arguments.fill, arguments.seed)
+        for operation, microseconds in grid_benchmarks(settings, positions, arguments.repeat).items():
+            results[f"{board_name(settings)}/{operation}"] = {"value": microseconds, "unit": "us"}
+        cpu_positions = positions[:arguments.cpu_positions]
+        for operation, milliseconds in cpu_benchmarks(cpu_positions, arguments.levels, arguments.nodes,
+                                                      arguments.playouts, arguments.seed, arguments.repeat).items():
+            results[f"{board_name(settings)}/{operation}"] = {"value": milliseconds, "unit": "ms"}
+    return results
+
+
+# Return the ratio of each result to the baseline and the names of the results slower than the allowed ratio
+# Ratios are divided by the ratio of the calibration times, so that a slower or busier machine is not a regression
+def compare(report, baseline, tolerance):
+    ratios = {}
+    regressions = []
+    machine_ratio = report["calibration"] / baseline["calibration"]
+    for name, result in report["results"].items():
+        if name in baseline["results"] and baseline["results"][name]["value"] > 0:
+            ratios[name] = result["value"] / baseline["results"][name]["value"] / machine_ratio
+            if ratios[name] > 1 + tolerance:
+                regressions.append(name)
+    return ratios, regressions
+
+
+# Parse the command line, run the benchmarks, write the results as JSON, and compare them with a baseline
+# Exit with status 1 if any result is slower than the baseline by more than the tolerance
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark grid operations and CPU move latency.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--positions", type=int, default=20, help="random positions per board")
+    parser.add_argument("--fill", type=float, default=0.4, help="fraction of the board filled in each position")
+    parser.add_argument("--repeat", type=int, default=5, help="repeats of each measurement; the best is kept")
+    parser.add_argument("--levels", nargs="+", choices=Game.CPU_LEVELS, default=Game.CPU_LEVELS)
+    parser.add_argument("--cpu-positions", type=int, default=3, help="positions per board for CPU turns")
+    parser.add_argument("--nodes", type=int, default=5000, help="alpha-beta node limit of the perfect level")
+    parser.add_argument("--playouts", type=int, default=200, help="playout limit of the Monte Carlo level")
+    parser.add_argument("--no-custom", action="store_true", help="only benchmark the preset boards")
+    parser.add_argument("--output", default="-", help="file for the JSON results ('-' for stdout)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown over the baseline")
+    arguments = parser.parse_args()
+    boards = [settings for settings in Game.BOARD_MODES_SETTINGS if settings is not None]
+    if not arguments.no_custom:
+        boards += CUSTOM_BOARD_SETTINGS
+    calibration = calibration_seconds(arguments.repeat)
+    results = run_benchmarks(boards, arguments)
+    # Calibrate before and after the benchmarks and keep the faster, in case the load of the machine changed
+    calibration = min(calibration, calibration_seconds(arguments.repeat))
+    report = {"python": platform.python_version(), "machine": platform.machine(),
+              "settings": {name: value for name, value in vars(arguments).items()
+                           if name not in ("output", "baseline", "tolerance")},
+              "calibration": calibration, "results": results}
+    regressions = []
+    if arguments.baseline:
+        with open(arguments.baseline, "r") as file:
+            baseline = json.load(file)
+        report["ratios"], regressions = compare(report, baseline, arguments.tolerance)
+        report["regressions"] = regressions
+    output = sys.stdout if arguments.output == "-" else open(arguments.output, "w")
+    try:
+        output.write(json.dumps(report, indent=2) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    for name in regressions:
+        print(f"regression: {name} is {report['ratios'][name]:.2f}x the baseline", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
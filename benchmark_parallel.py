@@ -0,0 +1,76 @@
+import argparse
+import os
+import random
+import time
+
+from main import Game, create_cpu, create_grid
+
+
+# Play a few random opening moves on a preset board so that every measurement starts from the same position
+def opening_position(settings, opening_length, seed):
+    height, width, win_length, gravity_enabled = settings
+    grid = create_grid(height, width, win_length, gravity_enabled)
+    rng = random.Random(seed)
+    for move_index in range(opening_length):
+        grid.make_move(*rng.choice(grid.legal_moves()), Game.SYMBOL_DEFAULTS[move_index % 2])
+    return grid
+
+
+# Return the wall time of a Monte Carlo move with a fixed total number of playouts split between the workers
+def time_monte_carlo(grid, worker_count, playout_limit):
+    cpu = create_cpu(Game.CPU_LEVELS.index("monte carlo"), "benchmark", Game.SYMBOL_DEFAULTS[grid.move_count % 2])
+    cpu.worker_count = worker_count
+    cpu.playout_limit = playout_limit
+    # Start the worker processes before timing so that only the search itself is measured
+    if worker_count > 1:
+        list(cpu.worker_pool().map(abs, range(worker_count)))
+    start = time.perf_counter()
+    cpu.select_move(grid)
+    elapsed = time.perf_counter() - start
+    cpu.close()
+    return elapsed
+
+
+# Return the number of alpha-beta nodes searched per second within a fixed time limit
+def alpha_beta_throughput(grid, worker_count, time_limit):
+    cpu = create_cpu(Game.CPU_LEVELS.index("perfect"), "benchmark", Game.SYMBOL_DEFAULTS[grid.move_count % 2])
+    cpu.worker_count = worker_count
+    cpu.search.time_limit = time_limit
+    if worker_count > 1:
+        list(cpu.worker_pool().map(abs, range(worker_count)))
+    start = time.perf_counter()
+    cpu.select_move(grid)
+    elapsed = time.perf_counter() - start
+    cpu.close()
+    return cpu.search.nodes / elapsed
+
+
+# Print the speedup of each worker count over a single process for every preset board
+def main():
+    parser = argparse.ArgumentParser(description="Measure the speedup of parallel CPU searches.")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--playouts", type=int, default=2000)
+    parser.add_argument("--time-limit", type=float, default=1.0)
+    parser.add_argument("--opening-length", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+    print(f"CPU cores available: {os.cpu_count()}")
+    for mode, settings in zip(Game.BOARD_MODES, Game.BOARD_MODES_SETTINGS):
+        if settings is None:
+            continue
+        grid = opening_position(settings, arguments.opening_length, arguments.seed)
+        print(f"{mode} {settings}")
+        base_time = base_throughput = None
+        for worker_count in arguments.workers:
+            random.seed(arguments.seed)
+            elapsed = time_monte_carlo(grid, worker_count, arguments.playouts)
+            throughput = alpha_beta_throughput(grid, worker_count, arguments.time_limit)
+            base_time = base_time or elapsed
+            base_throughput = base_throughput or throughput
+            print(f"\tworkers: {worker_count:<3}"
+                  f"monte carlo: {elapsed:.3f} s ({base_time / elapsed:.2f}x)  "
+                  f"alpha-beta: {throughput:.0f} nodes/s ({throughput / base_throughput:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import os
+import struct
+import time
+
+from main import AlphaBetaSearch, OpeningBook, SearchTimeout, book_path, create_grid
+
+
+# Return the value stored in the book for a solved negamax score: 0 for a tie, 127 - n for a win on the n-th move
+def book_value(score):
+    if score == 0:
+        return 0
+    plies = AlphaBetaSearch.WIN_SCORE - abs(score) + 1
+    value = max(1, 127 - plies)
+    return value if score > 0 else -value
+
+
+# Solve a position exactly within the time limit; return its book value, or None if the time limit ran out
+def solve_position(search, grid, symbol, opponent_symbol, time_limit):
+    search.root_moves = None
+    search.nodes = 0
+    search.deadline = time.perf_counter() + time_limit
+    search.table.new_search()
+    move_stack_height = len(grid.move_stack)
+    try:
+        score = search.negamax(grid, len(grid.free_cells), -search.WIN_SCORE - 1, search.WIN_SCORE + 1, 0,
+                               symbol, opponent_symbol)
+    except SearchTimeout:
+        while len(grid.move_stack) > move_stack_height:
+            grid.undo_move()
+        return None
+    return book_value(score)
+
+
+# Visit every position up to the given number of moves once per symmetry class and solve it
+# Return a dictionary of canonical position hashes and book values of the positions that were solved
+def solve_openings(settings, depth, time_limit):
+    grid = create_grid(*settings)
+    search = AlphaBetaSearch()
+    symbols = OpeningBook.ROLE_SYMBOLS
+    values = {}
+    visited = set()
+
+    # Solve the current position, then each position reached by one more move that has not been visited yet
+    def visit():
+        position_hash = grid.canonical_hash()
+        if position_hash in visited:
+            return
+        visited.add(position_hash)
+        symbol, opponent_symbol = symbols[grid.move_count % 2], symbols[1 - grid.move_count % 2]
+        value = solve_position(search, grid, symbol, opponent_symbol, time_limit)
+        if value is not None:
+            values[position_hash] = value
+        if grid.move_count >= depth:
+            return
+        for move in grid.legal_moves():
+            if grid.has_victory(*move, symbol) or len(grid.free_cells) == 1:
+                continue
+            grid.make_move(*move, symbol)
+            visit()
+            grid.undo_move()
+
+    visit()
+    return values
+
+
+# Write book values to a file as an open-addressing hash table at most half full so lookups stay short
+def write_book(path, settings, values):
+    slot_count = max(1, 2 * len(values))
+    slots = [(0, 0)] * slot_count
+    for position_hash, value in values.items():
+        position_hash = position_hash or 1
+        slot_index = position_hash % slot_count
+        while slots[slot_index][0] != 0:
+            slot_index = (slot_index + 1) % slot_count
+        slots[slot_index] = (position_hash, value)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(OpeningBook.HEADER.pack(OpeningBook.MAGIC, *settings, slot_count))
+        slot = struct.Struct(OpeningBook.SLOT.format)
+        for position_hash, value in slots:
+            file.write(slot.pack(position_hash, value))
+
+
+# Parse the command line, solve the openings of a board, and write them to an opening book file
+def main():
+    parser = argparse.ArgumentParser(description="Solve the openings of an m,n,k-game into an opening book.")
+    parser.add_argument("settings", type=int, nargs=4, metavar="SETTING",
+                        help="board height, width, win length, and gravity (0 or 1)")
+    parser.add_argument("--depth", type=int, help="number of moves from the empty board to solve (default: all)")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="seconds to solve each position")
+    parser.add_argument("--output", help="book file (default: the file the CPU players look for)")
+    arguments = parser.parse_args()
+    settings = tuple(arguments.settings)
+    depth = arguments.depth if arguments.depth is not None else settings[0] * settings[1]
+    start = time.perf_counter()
+    values = solve_openings(settings, depth, arguments.time_limit)
+    path = arguments.output or book_path(*settings)
+    write_book(path, settings, values)
+    print(f"Solved {len(values)} positions in {time.perf_counter() - start:.1f} s and wrote them to '{path}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from main import Game, create_grid
+
+
+# Return the value at a fraction of the way through a sorted list of values, e.g. 0.99 for the 99th percentile
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+# Send a command and read its one-line response; return list of response words
+async def request(reader, writer, command):
+    writer.write(f"{command}\n".encode())
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("the server closed the connection")
+    words = line.decode().split()
+    if not words or words[0] == "ERROR":
+        raise ValueError(line.decode().strip())
+    return words
+
+
+# Apply the moves in a response to a local copy of the grid; return true if the response ends the game
+def apply_response(grid, words):
+    finished = False
+    for index, word in enumerate(words):
+        if word in ("PLACED", "CPU"):
+            row, column = int(words[index + 1]) - 1, int(words[index + 2]) - 1
+            grid.make_move(row, column, Game.SYMBOL_DEFAULTS[word == "CPU"])
+        elif word == "END":
+            finished = True
+    return finished
+
+
+# Play one game of random moves against the server while mirroring it on a local grid
+# Return the seconds between sending each move and receiving the CPU's reply
+async def play_session(host, port, settings, level, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    grid = create_grid(*settings)
+    latencies = []
+    try:
+        first = rng.randint(0, 1)
+        words = await request(reader, writer, f"NEW {' '.join(str(setting) for setting in settings)} {level} {first} "
+                                              f"load test")
+        finished = apply_response(grid, words)
+        while not finished:
+            row, column = rng.choice(grid.legal_moves())
+            start = time.perf_counter()
+            words = await request(reader, writer, f"MOVE {row + 1} {column + 1}")
+            latencies.append(time.perf_counter() - start)
+            finished = apply_response(grid, words)
+        await request(reader, writer, "QUIT")
+    finally:
+        writer.close()
+    return latencies
+
+
+# Play a number of sessions with at most a number of them open at once; return dictionary of throughput and latency
+async def run_load_test(host, port, settings, level, session_count, concurrency, seed):
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = []
+
+    # Play one session when a slot is free, collecting its latencies or its error
+    async def limited_session(session_seed):
+        async with semaphore:
+            try:
+                latencies.extend(await play_session(host, port, settings, level, random.Random(session_seed)))
+            except (ConnectionError, ValueError) as error:
+                errors.append(str(error))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited_session(rng.getrandbits(32)) for _ in range(session_count)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    completed = session_count - len(errors)
+    return {"sessions": completed, "errors": len(errors), "first_errors": errors[:3], "moves": len(latencies),
+            "seconds": elapsed, "sessions_per_second": completed / elapsed if elapsed else 0.0,
+            "latency_p50_ms": percentile(latencies, 0.5) * 1e3, "latency_p99_ms": percentile(latencies, 0.99) * 1e3,
+            "latency_max_ms": (latencies[-1] if latencies else 0.0) * 1e3}
+
+
+# Parse the command line, run the load test against a running server, and print the results as JSON
+def main():
+    parser = argparse.ArgumentParser(description="Measure sessions per second and move latency of a game server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--board", type=int, nargs=4, default=[3, 3, 3, 0],
+                        metavar=("HEIGHT", "WIDTH", "WIN_LENGTH", "GRAVITY"))
+    parser.add_argument("--level", choices=Game.CPU_LEVELS, default="hard")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100, help="sessions open at once")
+    parser.add_argument("--seed", type=int)
+    arguments = parser.parse_args()
+    results = asyncio.run(run_load_test(arguments.host, arguments.port, tuple(arguments.board),
+                                        Game.CPU_LEVELS.index(arguments.level), arguments.sessions,
+                                        arguments.concurrency, arguments.seed))
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
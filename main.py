@@ -1,4 +1,15 @@
+import collections
+import concurrent.futures
+import functools
+import itertools
+import json
+import math
+import mmap
+import os
 import random
+import sqlite3
+import struct
+import time
 
 
 # Check if an input meets a set of criteria; return validated input
@@ -34,6 +45,25 @@ def validate_input(prompt="Enter a valid input: ", type_=None, range_=None, min_
             return input_
 
 
+# Return the Zobrist key of a symbol in the cell with the given row index and column index
+# Keys are seeded by the cell and symbol so that every grid and process hashes the same position identically
+def zobrist_key(row_index, column_index, symbol):
+    cell = (row_index, column_index, symbol)
+    if cell not in ZOBRIST_KEYS:
+        ZOBRIST_KEYS[cell] = random.Random(f"{row_index},{column_index},{symbol}").getrandbits(64)
+    return ZOBRIST_KEYS[cell]
+
+
+ZOBRIST_KEYS = {}
+
+
+# Return the cache of Zobrist keys under each symmetry for a board geometry and symmetry group
+# Every grid with the same geometry and symmetries shares the cache, so keys are only computed once
+@functools.lru_cache(maxsize=16)
+def symmetric_zobrist_keys(row_count, column_count, symmetries):
+    return {}
+
+
 # Add visual separator to a string for improved readability; return updated string
 def visual_separator(message=None):
     separator = "".join("=" for _ in range(42))
@@ -42,152 +72,307 @@ def visual_separator(message=None):
     return separator
 
 
+class WinningLines:
+    HORIZONTAL, VERTICAL, LEFT_DIAGONAL, RIGHT_DIAGONAL = range(4)
+    DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+    # Initialize every line of cells long enough to win and an index of the lines passing through each cell
+    def __init__(self, row_count, column_count, consecutive_win_length):
+        self.lines = []
+        self.line_directions = []
+        self.cell_lines = {(row_index, column_index): [] for row_index in range(row_count)
+                           for column_index in range(column_count)}
+        self.cell_direction_lines = [{cell: [] for cell in self.cell_lines} for _ in self.DIRECTIONS]
+        for direction, (row_step, column_step) in enumerate(self.DIRECTIONS):
+            for row_index, column_index in self.cell_lines:
+                line = tuple((row_index + i * row_step, column_index + i * column_step)
+                             for i in range(consecutive_win_length))
+                if all(cell in self.cell_lines for cell in line):
+                    for cell in line:
+                        self.cell_lines[cell].append(len(self.lines))
+                        self.cell_direction_lines[direction][cell].append(len(self.lines))
+                    self.lines.append(line)
+                    self.line_directions.append(direction)
+
+    # Return the indices of the lines that pass through a cell
+    def lines_through(self, cell):
+        return self.cell_lines[cell]
+
+    # Return the cells of the line with the given index
+    def line_cells(self, line_id):
+        return self.lines[line_id]
+
+
+# Return the winning lines of a board geometry, shared by every grid of that geometry; return WinningLines object
+@functools.lru_cache(maxsize=16)
+def winning_lines(row_count, column_count, consecutive_win_length):
+    return WinningLines(row_count, column_count, consecutive_win_length)
+
+
 class Grid:
+    BACKEND = "list"
+
     # Initialize grid's rows, columns, and win length; create a two-dimensional list of blank cells
     def __init__(self, row_count, column_count, consecutive_win_length):
         self.rows = range(row_count)
         self.columns = range(column_count)
         self.win_length = consecutive_win_length
         self.cells = [[" " for _ in self.columns] for _ in self.rows]
+        self.reset_tracking()
 
     # Reset each cell in the grid to be empty
     def reset(self):
         self.cells = [[" " for _ in self.columns] for _ in self.rows]
+        self.reset_tracking()
+
+    # Reset the move count, free cells, column heights, and symbol counts that are maintained as symbols are placed
+    def reset_tracking(self):
+        self.move_count = 0
+        self.free_cells = set((row_index, column_index) for column_index in self.columns for row_index in self.rows)
+        self.column_heights = [0 for _ in self.columns]
+        self.symbol_counts = {}
+        self.move_stack = []
+        self.position_hash = 0
+        self.symmetry_list = self.symmetries()
+        self.symmetry_hashes = [0 for _ in self.symmetry_list]
+        self.symmetric_keys = symmetric_zobrist_keys(self.rows.stop, self.columns.stop, tuple(self.symmetry_list))
+        self.winning_lines = winning_lines(self.rows.stop, self.columns.stop, self.win_length)
+        self.reset_line_counts()
+
+    # Reset the counts of each symbol in every winning line and the open lines of each symbol
+    def reset_line_counts(self):
+        self.line_counts = {}
+        self.line_totals = self.new_line_counts()
+        self.open_lines = {}
+
+    # Return a new container of a count for every winning line of the grid
+    def new_line_counts(self):
+        return [0 for _ in self.winning_lines.lines]
+
+    # Store a symbol in the cell with the given row index and column index
+    def set_cell(self, row_index, column_index, symbol):
+        self.cells[row_index][column_index] = symbol
+
+    # Remove a symbol from the cell with the given row index and column index
+    def clear_cell(self, row_index, column_index, symbol):
+        self.cells[row_index][column_index] = " "
+
+    # Place a symbol in a cell and update the move count, free cells, column heights, and symbol counts
+    def place_symbol(self, row_index, column_index, symbol):
+        self.set_cell(row_index, column_index, symbol)
+        self.move_count += 1
+        self.free_cells.discard((row_index, column_index))
+        self.column_heights[column_index] += 1
+        self.symbol_counts[symbol] = self.symbol_counts.get(symbol, 0) + 1
+        self.move_stack.append((row_index, column_index, symbol))
+        self.symmetry_hashes = [position_hash ^ key for position_hash, key
+                                in zip(self.symmetry_hashes, self.symmetric_cell_keys(row_index, column_index, symbol))]
+        self.position_hash = self.symmetry_hashes[0]
+        self.count_placed_symbol(row_index, column_index, symbol)
+
+    # Remove the most recently placed symbol and restore the move count, free cells, column heights, and symbol counts
+    def remove_symbol(self):
+        row_index, column_index, symbol = self.move_stack.pop()
+        self.clear_cell(row_index, column_index, symbol)
+        self.move_count -= 1
+        self.free_cells.add((row_index, column_index))
+        self.column_heights[column_index] -= 1
+        self.symbol_counts[symbol] -= 1
+        self.symmetry_hashes = [position_hash ^ key for position_hash, key
+                                in zip(self.symmetry_hashes, self.symmetric_cell_keys(row_index, column_index, symbol))]
+        self.position_hash = self.symmetry_hashes[0]
+        self.count_removed_symbol(row_index, column_index, symbol)
+        return row_index, column_index, symbol
+
+    # Return the symbol that holds every symbol of a line, or None if the line is empty or mixed
+    def line_owner(self, line_index):
+        for symbol, line_counts in self.line_counts.items():
+            if line_counts[line_index]:
+                return symbol if line_counts[line_index] == self.line_totals[line_index] else None
+        return None
+
+    # Update the counts of the lines through a cell after a symbol is placed there
+    # Lines held by a single symbol are open for it and are kept in sets by how many of its symbols they hold
+    def count_placed_symbol(self, row_index, column_index, symbol):
+        if symbol not in self.line_counts:
+            self.line_counts[symbol] = self.new_line_counts()
+            self.open_lines[symbol] = [set() for _ in range(self.win_length + 1)]
+        line_counts = self.line_counts[symbol]
+        open_lines = self.open_lines[symbol]
+        for line_index in self.winning_lines.lines_through((row_index, column_index)):
+            count = line_counts[line_index]
+            total = self.line_totals[line_index]
+            if count == total:
+                open_lines[count].discard(line_index)
+                open_lines[count + 1].add(line_index)
+            elif count == 0:
+                owner = self.line_owner(line_index)
+                if owner is not None:
+                    self.open_lines[owner][total].discard(line_index)
+            line_counts[line_index] = count + 1
+            self.line_totals[line_index] = total + 1
+
+    # Update the counts of the lines through a cell after the symbol in it is removed
+    def count_removed_symbol(self, row_index, column_index, symbol):
+        line_counts = self.line_counts[symbol]
+        open_lines = self.open_lines[symbol]
+        for line_index in self.winning_lines.lines_through((row_index, column_index)):
+            count = line_counts[line_index] - 1
+            total = self.line_totals[line_index] - 1
+            line_counts[line_index] = count
+            self.line_totals[line_index] = total
+            if count == total:
+                open_lines[count + 1].discard(line_index)
+                if count:
+                    open_lines[count].add(line_index)
+            elif count == 0:
+                owner = self.line_owner(line_index)
+                if owner is not None:
+                    self.open_lines[owner][total].add(line_index)
+
+    # Return the set of blank cells that would complete a line held only by the symbol, i.e., winning moves
+    def winning_cells(self, symbol):
+        if symbol not in self.open_lines:
+            return set() if self.win_length > 1 else set(self.free_cells)
+        line_cells = self.winning_lines.line_cells
+        return set(cell for line_index in self.open_lines[symbol][self.win_length - 1]
+                   for cell in line_cells(line_index) if cell in self.free_cells)
+
+    # Return a dictionary of each blank cell that would create new winning cells for the symbol and those cells
+    # These are the blank cells of the lines held only by the symbol that are two symbols short of a win
+    def threat_cells(self, symbol):
+        threats = {}
+        if symbol not in self.open_lines or self.win_length < 2:
+            return threats
+        for line_index in self.open_lines[symbol][self.win_length - 2]:
+            blank_cells = [cell for cell in self.winning_lines.line_cells(line_index) if cell in self.free_cells]
+            for cell in blank_cells:
+                threats.setdefault(cell, set()).update(blank_cell for blank_cell in blank_cells if blank_cell != cell)
+        return threats
+
+    # Return the legal moves after which the symbol has at least two legal winning moves, so it cannot be blocked
+    def double_threat_moves(self, symbol):
+        double_threats = []
+        legal_moves = self.legal_moves()
+        for move in self.threat_cells(symbol):
+            if move not in legal_moves:
+                continue
+            self.make_move(*move, symbol)
+            if len(self.winning_cells(symbol).intersection(self.legal_moves())) > 1:
+                double_threats.append(move)
+            self.undo_move()
+        return double_threats
+
+    # Make a move that can be taken back with 'undo_move'; return the row index and column index of the placed symbol
+    def make_move(self, row_index, column_index, symbol):
+        return self.add_symbol(row_index, column_index, symbol)
+
+    # Take back the most recent move; return the row index, column index, and symbol of the removed move
+    def undo_move(self):
+        return self.remove_symbol()
+
+    # Return the symmetries of the grid as (transpose, flip rows, flip columns) tuples, starting with the identity
+    def symmetries(self):
+        return [(False, False, False)]
+
+    # Return the cell that a symmetry maps the cell with the given row index and column index onto
+    def transform_cell(self, row_index, column_index, symmetry):
+        transpose, flip_rows, flip_columns = symmetry
+        if transpose:
+            row_index, column_index = column_index, row_index
+        if flip_rows:
+            row_index = self.rows.stop - row_index - 1
+        if flip_columns:
+            column_index = self.columns.stop - column_index - 1
+        return row_index, column_index
+
+    # Return the cell that a symmetry maps onto the cell with the given row index and column index, undoing
+    # 'transform_cell'; grids are only transposed if they are square, so the flips can be undone before transposing
+    def inverse_transform_cell(self, row_index, column_index, symmetry):
+        transpose, flip_rows, flip_columns = symmetry
+        if flip_rows:
+            row_index = self.rows.stop - row_index - 1
+        if flip_columns:
+            column_index = self.columns.stop - column_index - 1
+        if transpose:
+            row_index, column_index = column_index, row_index
+        return row_index, column_index
+
+    # Return the Zobrist keys of a symbol in a cell under each symmetry of the grid
+    def symmetric_cell_keys(self, row_index, column_index, symbol):
+        cell = (row_index, column_index, symbol)
+        if cell not in self.symmetric_keys:
+            cells = [self.transform_cell(row_index, column_index, symmetry) for symmetry in self.symmetry_list]
+            self.symmetric_keys[cell] = tuple(zobrist_key(*symmetric_cell, symbol) for symmetric_cell in cells)
+        return self.symmetric_keys[cell]
+
+    # Return the hash of the position that is the same for every position that a symmetry maps onto it
+    def canonical_hash(self):
+        return min(self.symmetry_hashes)
+
+    # Return the symmetry that maps the grid onto the position whose hash is the canonical hash
+    def canonical_symmetry(self):
+        return self.symmetry_list[self.symmetry_hashes.index(min(self.symmetry_hashes))]
+
+    # Return the hash of the position under each symmetry, renaming symbols through the given mapping if there is one
+    def symmetric_hashes(self, symbol_map=None):
+        if not symbol_map or all(symbol == role_symbol for symbol, role_symbol in symbol_map.items()):
+            return list(self.symmetry_hashes)
+        hashes = []
+        for symmetry in self.symmetries():
+            position_hash = 0
+            for row_index, column_index, symbol in self.move_stack:
+                symbol = symbol_map[symbol] if symbol_map else symbol
+                position_hash ^= zobrist_key(*self.transform_cell(row_index, column_index, symmetry), symbol)
+            hashes.append(position_hash)
+        return hashes
+
+    # Return a compact tuple of the grid's settings and moves that is cheap to send to worker processes
+    def serialize(self):
+        return (self.rows.stop, self.columns.stop, self.win_length, isinstance(self, GravityEnabled), self.BACKEND,
+                tuple(self.move_stack))
+
+    # Return true if one of the given winning lines through a cell would be filled by the symbol placed there
+    # A line is filled if the symbol occupies its other cells, which is when its count reaches the needed value
+    def fills_line(self, row_index, column_index, symbol, line_indices):
+        needed = self.win_length - 1 + (self.cells[row_index][column_index] == symbol)
+        line_counts = self.line_counts.get(symbol)
+        if line_counts is None:
+            return needed == 0 and bool(line_indices)
+        return any(line_counts[line_index] == needed for line_index in line_indices)
 
-    # Return true if there is a consecutive subsequence of symbols required for a win in a sequence
-    def has_consecutive_identical_elements(self, sequence):
-        if len(sequence) >= self.win_length:
-            for i in range(len(sequence) - self.win_length + 1):
-                subsequence = [sequence[j] for j in range(i, i + self.win_length)]
-                if all(element == subsequence[0] for element in subsequence):
-                    return True
-        return False
-    
     # Return true if each element of a row has been occupied by a player's symbol
     def is_horizontal_win(self, row_index, column_index, symbol):
-        horizontal = [symbol]
-        left_end_reached = False
-        right_end_reached = False
-        for i in range(1, self.win_length):
-            if not left_end_reached:
-                if column_index - i < 0:
-                    left_end_reached = True
-                else:
-                    square = self.cells[row_index][column_index - i]
-                    if square == " ":
-                        left_end_reached = True
-                    else:
-                        horizontal.insert(0, square)
-            if not right_end_reached:
-                if column_index + i > self.columns.stop - 1:
-                    right_end_reached = True
-                else:
-                    square = self.cells[row_index][column_index + i]
-                    if square == " ":
-                        right_end_reached = True
-                    else:
-                        horizontal.append(square)
-            if left_end_reached and right_end_reached:
-                break
-        return self.has_consecutive_identical_elements(horizontal)
+        line_indices = self.winning_lines.cell_direction_lines[WinningLines.HORIZONTAL][(row_index, column_index)]
+        return self.fills_line(row_index, column_index, symbol, line_indices)
 
     # Return true if each element of a column has been occupied by a player's symbol
     def is_vertical_win(self, row_index, column_index, symbol):
-        vertical = [symbol]
-        left_end_reached = False
-        right_end_reached = False
-        for i in range(1, self.win_length):
-            if not left_end_reached:
-                if row_index - i < 0:
-                    left_end_reached = True
-                else:
-                    square = self.cells[row_index - i][column_index]
-                    if square == " ":
-                        left_end_reached = True
-                    else:
-                        vertical.insert(0, square)
-            if not right_end_reached:
-                if row_index + i > self.rows.stop - 1:
-                    right_end_reached = True
-                else:
-                    square = self.cells[row_index + i][column_index]
-                    if square == " ":
-                        right_end_reached = True
-                    else:
-                        vertical.append(square)
-            if left_end_reached and right_end_reached:
-                break
-        return self.has_consecutive_identical_elements(vertical)
+        line_indices = self.winning_lines.cell_direction_lines[WinningLines.VERTICAL][(row_index, column_index)]
+        return self.fills_line(row_index, column_index, symbol, line_indices)
 
     # Return true if each element of a left diagonal has been occupied by a player's symbol
     def is_left_diagonal_win(self, row_index, column_index, symbol):
-        left_diagonal = [symbol]
-        left_end_reached = False
-        right_end_reached = False
-        for i in range(1, self.win_length):
-            if not left_end_reached:
-                if row_index - i < 0 or column_index - i < 0:
-                    left_end_reached = True
-                else:
-                    square = self.cells[row_index - i][column_index - i]
-                    if square == " ":
-                        left_end_reached = True
-                    else:
-                        left_diagonal.insert(0, square)
-            if not right_end_reached:
-                if row_index + i > self.rows.stop - 1 or column_index + i > self.columns.stop - 1:
-                    right_end_reached = True
-                else:
-                    square = self.cells[row_index + i][column_index + i]
-                    if square == " ":
-                        right_end_reached = True
-                    else:
-                        left_diagonal.append(square)
-            if left_end_reached and right_end_reached:
-                break
-        return self.has_consecutive_identical_elements(left_diagonal)
+        line_indices = self.winning_lines.cell_direction_lines[WinningLines.LEFT_DIAGONAL][(row_index, column_index)]
+        return self.fills_line(row_index, column_index, symbol, line_indices)
 
     # Return true if each element of a right diagonal has been occupied by a player's symbol
     def is_right_diagonal_win(self, row_index, column_index, symbol):
-        right_diagonal = [symbol]
-        left_end_reached = False
-        right_end_reached = False
-        for i in range(1, self.win_length):
-            if not left_end_reached:
-                if row_index + i > self.rows.stop - 1 or column_index - i < 0:
-                    left_end_reached = True
-                else:
-                    square = self.cells[row_index + i][column_index - i]
-                    if square == " ":
-                        left_end_reached = True
-                    else:
-                        right_diagonal.insert(0, square)
-            if not right_end_reached:
-                if row_index - i < 0 or column_index + i > self.columns.stop - 1:
-                    right_end_reached = True
-                else:
-                    square = self.cells[row_index - i][column_index + i]
-                    if square == " ":
-                        right_end_reached = True
-                    else:
-                        right_diagonal.append(square)
-            if left_end_reached and right_end_reached:
-                break
-        return self.has_consecutive_identical_elements(right_diagonal)
+        line_indices = self.winning_lines.cell_direction_lines[WinningLines.RIGHT_DIAGONAL][(row_index, column_index)]
+        return self.fills_line(row_index, column_index, symbol, line_indices)
 
     # Return true if each element of a row, column, or diagonal has been occupied by a player's symbol
     def has_victory(self, row_index, column_index, symbol):
-        position = (row_index, column_index, symbol)
-        return any([self.is_horizontal_win(*position), self.is_vertical_win(*position),
-                    self.is_left_diagonal_win(*position), self.is_right_diagonal_win(*position)])
-    
+        line_indices = self.winning_lines.lines_through((row_index, column_index))
+        return self.fills_line(row_index, column_index, symbol, line_indices)
+
     # Return true if each element of the grid has been occupied, i.e., a tie has occurred
     def is_full(self):
-        for row_index in self.rows:
-            for column_index in self.columns:
-                if self.cells[row_index][column_index] == " ":
-                    return False
-        return True
+        return not self.free_cells
+
+    # Return a set of every symbol that has been placed on the grid
+    def placed_symbols(self):
+        return set(symbol for symbol, count in self.symbol_counts.items() if count)
 
 
 class GravityDisabled(Grid):
@@ -197,7 +382,8 @@ class GravityDisabled(Grid):
 
     # Overload string representation of grid object with column and row indices; return the grid's cells in text format
     def __str__(self):
-        grid_cells = ["\t" + " | ".join(self.cells[row_index][column_index] for column_index in self.columns)
+        cells = self.cells
+        grid_cells = ["\t" + " | ".join(cells[row_index][column_index] for column_index in self.columns)
                       + f"  {row_index + 1}\n" for row_index in self.rows]
         grid_lines = "\t" + "+".join("---" for _ in self.columns)[1:-1] + "\n"
         column_labels = "\t" + "   ".join(str(column_index + 1) for column_index in self.columns)
@@ -205,13 +391,17 @@ class GravityDisabled(Grid):
 
     # Add symbol to a cell with the given row index and column index; return the given row index and column index
     def add_symbol(self, row_index, column_index, symbol):
-        self.cells[row_index][column_index] = symbol
+        self.place_symbol(row_index, column_index, symbol)
         return row_index, column_index
 
     # Return a list of tuples containing the row index and column index of cells that are blank, i.e., a legal move
     def legal_moves(self):
-        return [(row_index, column_index) for column_index in self.columns for row_index in self.rows
-                if self.cells[row_index][column_index] == " "]
+        return list(self.free_cells)
+
+    # Return the rotations and reflections of the grid, including transposition if the grid is square
+    def symmetries(self):
+        transpositions = (False, True) if self.rows.stop == self.columns.stop else (False,)
+        return list(itertools.product(transpositions, (False, True), (False, True)))
 
 
 class GravityEnabled(Grid):
@@ -221,7 +411,8 @@ class GravityEnabled(Grid):
 
     # Overload string representation of grid object with column indices; return the grid's cells in text format
     def __str__(self):
-        grid_cells = ["\t" + " | ".join(self.cells[row_index][column_index] for column_index in self.columns) + "\n"
+        cells = self.cells
+        grid_cells = ["\t" + " | ".join(cells[row_index][column_index] for column_index in self.columns) + "\n"
                       for row_index in self.rows]
         grid_lines = "\t" + "+".join("---" for _ in self.columns)[1:-1] + "\n"
         column_labels = "\t" + "   ".join(str(column_index + 1) for column_index in self.columns)
@@ -229,40 +420,857 @@ class GravityEnabled(Grid):
 
     # Add symbol to a column such that it falls to the bottom of the grid according to gravity; return new indices
     def add_symbol(self, _, column_index, symbol):
-        for row_index in self.rows:
-            if self.cells[self.rows.stop - row_index - 1][column_index] == " ":
-                self.cells[self.rows.stop - row_index - 1][column_index] = symbol
-                return self.rows.stop - row_index - 1, column_index
+        row_index = self.rows.stop - self.column_heights[column_index] - 1
+        self.place_symbol(row_index, column_index, symbol)
+        return row_index, column_index
 
     # Return a list containing the row index and column index of all legal moves
     def legal_moves(self):
-        legal_moves = []
-        for column_index in self.columns:
-            for row_index in self.rows:
-                if self.cells[self.rows.stop - row_index - 1][column_index] == " ":
-                    legal_moves.append((self.rows.stop - row_index - 1, column_index))
-                    break
-        return legal_moves
+        return [(self.rows.stop - column_height - 1, column_index)
+                for column_index, column_height in enumerate(self.column_heights) if column_height < self.rows.stop]
+
+    # Return the symmetries of the grid; gravity only allows reflecting the columns
+    def symmetries(self):
+        return [(False, False, False), (False, False, True)]
+
+
+class BitboardGrid(Grid):
+    BACKEND = "bitboard"
+
+    # Initialize grid's rows, columns, and win length; store one integer bitmask per symbol instead of a list of cells
+    # Each row is padded with an always-empty sentinel bit so that shifted masks never wrap onto the next row
+    def __init__(self, row_count, column_count, consecutive_win_length):
+        self.rows = range(row_count)
+        self.columns = range(column_count)
+        self.win_length = consecutive_win_length
+        self.stride = column_count + 1
+        self.cell_count = row_count * column_count
+        self.board_mask = sum(1 << row_index * self.stride + column_index for row_index in self.rows
+                              for column_index in self.columns)
+        # Shift distances for horizontal, vertical, left diagonal, and right diagonal neighbours
+        self.horizontal_shift = 1
+        self.vertical_shift = self.stride
+        self.left_diagonal_shift = self.stride + 1
+        self.right_diagonal_shift = self.stride - 1
+        self.run_start_masks = bitboard_run_start_masks(row_count, column_count, consecutive_win_length)
+        self.line_masks = bitboard_line_masks(row_count, column_count, consecutive_win_length)
+        self.bitboards = {}
+        self.occupied = 0
+        self.reset_tracking()
+
+    # Reset each cell in the grid to be empty
+    def reset(self):
+        self.bitboards = {}
+        self.occupied = 0
+        self.reset_tracking()
+
+    # Keep no line counts, since wins, winning cells, and threats are found from the bitboards
+    def reset_line_counts(self):
+        pass
+
+    # Keep no line counts when a symbol is placed
+    def count_placed_symbol(self, row_index, column_index, symbol):
+        pass
+
+    # Keep no line counts when a symbol is removed
+    def count_removed_symbol(self, row_index, column_index, symbol):
+        pass
+
+    # Return the bit index of the cell with the given row index and column index
+    def bit_index(self, row_index, column_index):
+        return row_index * self.stride + column_index
+
+    # Return a list of the cells whose bits are set in a mask
+    def mask_cells(self, mask):
+        cells = []
+        while mask:
+            bit = mask & -mask
+            cells.append(divmod(bit.bit_length() - 1, self.stride))
+            mask ^= bit
+        return cells
+
+    # Return the two-dimensional list of cells built from the bitboards, e.g. for rendering the grid
+    @property
+    def cells(self):
+        cells = [[" " for _ in self.columns] for _ in self.rows]
+        for symbol, bitboard in self.bitboards.items():
+            for row_index, column_index in self.mask_cells(bitboard):
+                cells[row_index][column_index] = symbol
+        return cells
+
+    # Return a dictionary of the lines held only by each placed symbol, grouped by how many of its symbols they hold
+    # The lines are counted from the bitboards when needed, e.g. by the search's evaluation, rather than kept
+    @property
+    def open_lines(self):
+        open_lines = {}
+        for symbol, bitboard in self.bitboards.items():
+            opponent_bitboard = self.occupied & ~bitboard
+            open_lines[symbol] = [set() for _ in range(self.win_length + 1)]
+            for line_index, line_mask in enumerate(self.line_masks):
+                count = (line_mask & bitboard).bit_count()
+                if count and not line_mask & opponent_bitboard:
+                    open_lines[symbol][count].add(line_index)
+        return open_lines
+
+    # Store a symbol in a cell by setting its bit in the symbol's bitboard
+    def set_cell(self, row_index, column_index, symbol):
+        bit = 1 << self.bit_index(row_index, column_index)
+        self.bitboards[symbol] = self.bitboards.get(symbol, 0) | bit
+        self.occupied |= bit
+
+    # Remove a symbol from a cell by clearing its bit in the symbol's bitboard
+    def clear_cell(self, row_index, column_index, symbol):
+        bit = 1 << self.bit_index(row_index, column_index)
+        self.bitboards[symbol] &= ~bit
+        self.occupied &= ~bit
+
+    # Return a mask with a bit at the start of every consecutive run of set bits of the win length in one direction
+    def consecutive_runs(self, bitboard, shift):
+        length = 1
+        while length * 2 <= self.win_length:
+            bitboard &= bitboard >> (shift * length)
+            length *= 2
+        if length < self.win_length:
+            bitboard &= bitboard >> (shift * (self.win_length - length))
+        return bitboard
+
+    # Return true if a run of the symbol in the given direction passes through the cell once the symbol is placed there
+    def is_win(self, row_index, column_index, symbol, shift):
+        bit_index = self.bit_index(row_index, column_index)
+        bitboard = self.bitboards.get(symbol, 0) | 1 << bit_index
+        return self.consecutive_runs(bitboard, shift) & self.run_start_masks[shift][bit_index] != 0
+
+    # Return true if each element of a row has been occupied by a player's symbol
+    def is_horizontal_win(self, row_index, column_index, symbol):
+        return self.is_win(row_index, column_index, symbol, self.horizontal_shift)
+
+    # Return true if each element of a column has been occupied by a player's symbol
+    def is_vertical_win(self, row_index, column_index, symbol):
+        return self.is_win(row_index, column_index, symbol, self.vertical_shift)
+
+    # Return true if each element of a left diagonal has been occupied by a player's symbol
+    def is_left_diagonal_win(self, row_index, column_index, symbol):
+        return self.is_win(row_index, column_index, symbol, self.left_diagonal_shift)
+
+    # Return true if each element of a right diagonal has been occupied by a player's symbol
+    def is_right_diagonal_win(self, row_index, column_index, symbol):
+        return self.is_win(row_index, column_index, symbol, self.right_diagonal_shift)
+
+    # Return true if each element of a row, column, or diagonal has been occupied by a player's symbol
+    def has_victory(self, row_index, column_index, symbol):
+        bit_index = self.bit_index(row_index, column_index)
+        bitboard = self.bitboards.get(symbol, 0) | 1 << bit_index
+        for shift, run_start_masks in self.run_start_masks.items():
+            if self.consecutive_runs(bitboard, shift) & run_start_masks[bit_index]:
+                return True
+        return False
+
+    # Return the set of blank cells that would complete a line of the symbol, i.e., winning moves
+    # A blank cell wins in a direction if the symbol holds the j cells before it and the win length - 1 - j cells after
+    def winning_cells(self, symbol):
+        bitboard = self.bitboards.get(symbol, 0)
+        if bitboard.bit_count() < self.win_length - 1:
+            return set()
+        blank = self.board_mask & ~self.occupied
+        winning = 0
+        for shift in self.run_start_masks:
+            # Masks of the cells followed, and preceded, by a run of the symbol of each length up to win length - 1
+            # Each list stops at the first empty mask, since every longer run is then empty too
+            after = [blank]
+            while after[-1] and len(after) < self.win_length:
+                after.append(after[-1] & bitboard >> (shift * len(after)))
+            before = [-1]
+            while before[-1] and len(before) < self.win_length:
+                before.append(before[-1] & bitboard << (shift * len(before)))
+            for j in range(max(0, self.win_length - len(after)), min(len(before), self.win_length)):
+                winning |= before[j] & after[self.win_length - 1 - j]
+        return set(self.mask_cells(winning))
+
+    # Return a dictionary of each blank cell that would create new winning cells for the symbol and those cells
+    # These are the blank cells of the lines held only by the symbol that are two symbols short of a win
+    def threat_cells(self, symbol):
+        threats = {}
+        bitboard = self.bitboards.get(symbol, 0)
+        if not bitboard or self.win_length < 3:
+            return threats
+        opponent_bitboard = self.occupied & ~bitboard
+        for line_mask in self.line_masks:
+            if not line_mask & opponent_bitboard and (line_mask & bitboard).bit_count() == self.win_length - 2:
+                blank_cells = self.mask_cells(line_mask & ~bitboard)
+                for cell in blank_cells:
+                    threats.setdefault(cell, set()).update(other for other in blank_cells if other != cell)
+        return threats
+
+    # Return true if each element of the grid has been occupied, i.e., a tie has occurred
+    def is_full(self):
+        return self.occupied.bit_count() == self.cell_count
+
+
+class BitboardGravityDisabled(BitboardGrid, GravityDisabled):
+    # Initialize bitboard-backed gravity-disabled grid with the constructor from the 'BitboardGrid' class
+    def __init__(self, row_count, column_count, consecutive_win_length):
+        super().__init__(row_count, column_count, consecutive_win_length)
+
+
+class BitboardGravityEnabled(BitboardGrid, GravityEnabled):
+    # Initialize bitboard-backed gravity-enabled grid with the constructor from the 'BitboardGrid' class
+    def __init__(self, row_count, column_count, consecutive_win_length):
+        super().__init__(row_count, column_count, consecutive_win_length)
+
+
+# Return, for each direction's shift and each bit, the mask of run start bits whose win-length run passes through it
+# The masks only depend on the board geometry, so they are shared by every bitboard grid of that geometry
+@functools.lru_cache(maxsize=16)
+def bitboard_run_start_masks(row_count, column_count, consecutive_win_length):
+    stride = column_count + 1
+    run_start_masks = {}
+    for shift in (1, stride, stride + 1, stride - 1):
+        run_start_masks[shift] = []
+        for bit_index in range(row_count * stride):
+            mask = 0
+            for i in range(consecutive_win_length):
+                if bit_index - i * shift >= 0:
+                    mask |= 1 << (bit_index - i * shift)
+            run_start_masks[shift].append(mask)
+    return run_start_masks
+
+
+# Return the mask of the cells of every winning line of a board geometry, in the order of its 'WinningLines'
+@functools.lru_cache(maxsize=16)
+def bitboard_line_masks(row_count, column_count, consecutive_win_length):
+    stride = column_count + 1
+    return [sum(1 << row_index * stride + column_index for row_index, column_index in line)
+            for line in winning_lines(row_count, column_count, consecutive_win_length).lines]
+
+
+class SparseFreeCells:
+    # Initialize a view of the blank cells of a sparse grid without storing them
+    def __init__(self, grid):
+        self.grid = grid
+
+    # Return true if a cell is on the grid and blank
+    def __contains__(self, cell):
+        row_index, column_index = cell
+        return row_index in self.grid.rows and column_index in self.grid.columns and cell not in self.grid.stones
+
+    # Return the number of blank cells
+    def __len__(self):
+        return len(self.grid.rows) * len(self.grid.columns) - len(self.grid.stones)
+
+
+class SparseWinningLines:
+    # Initialize winning lines of a board that are computed when needed instead of stored for every cell
+    # A line is identified by its direction index and first cell
+    def __init__(self, row_count, column_count, consecutive_win_length):
+        self.rows = range(row_count)
+        self.columns = range(column_count)
+        self.win_length = consecutive_win_length
+
+    # Return the lines that pass through a cell and fit on the board
+    def lines_through(self, cell):
+        return list(self.generate_lines_through(*cell))
+
+    # Return the cells of the line with the given direction index and first cell
+    def line_cells(self, line_id):
+        direction, row_index, column_index = line_id
+        row_step, column_step = WinningLines.DIRECTIONS[direction]
+        return tuple((row_index + i * row_step, column_index + i * column_step) for i in range(self.win_length))
+
+    # Yield the lines that pass through the cell with the given row index and column index and fit on the board
+    def generate_lines_through(self, row_index, column_index):
+        last = self.win_length - 1
+        for direction, (row_step, column_step) in enumerate(WinningLines.DIRECTIONS):
+            for i in range(self.win_length):
+                first_row, first_column = row_index - i * row_step, column_index - i * column_step
+                last_row, last_column = first_row + last * row_step, first_column + last * column_step
+                if (first_row in self.rows and first_column in self.columns
+                        and last_row in self.rows and last_column in self.columns):
+                    yield direction, first_row, first_column
+
+
+class SparseGrid(GravityDisabled):
+    BACKEND = "sparse"
+    CANDIDATE_RADIUS = 2
+    VIEW_SIZE = 15
+
+    # Initialize grid's rows, columns, and win length; store only the occupied cells so boards can be very large
+    def __init__(self, row_count, column_count, consecutive_win_length):
+        self.rows = range(row_count)
+        self.columns = range(column_count)
+        self.win_length = consecutive_win_length
+        self.stones = {}
+        self.reset_tracking()
+
+    # Reset each cell in the grid to be empty
+    def reset(self):
+        self.stones = {}
+        self.reset_tracking()
+
+    # Reset the tracked state, keeping only state that grows with the number of symbols placed
+    def reset_tracking(self):
+        self.move_count = 0
+        self.free_cells = SparseFreeCells(self)
+        self.candidate_counts = {}
+        self.symbol_counts = {}
+        self.move_stack = []
+        self.position_hash = 0
+        self.symmetry_list = self.symmetries()
+        self.symmetry_hashes = [0]
+        self.symmetric_keys = symmetric_zobrist_keys(self.rows.stop, self.columns.stop, tuple(self.symmetry_list))
+        self.winning_lines = SparseWinningLines(self.rows.stop, self.columns.stop, self.win_length)
+        self.reset_line_counts()
+
+    # Return a new container of a count for every winning line, holding only the lines that have been counted
+    def new_line_counts(self):
+        return collections.defaultdict(int)
+
+    # Return the identity as the only symmetry, since checking others would cost time proportional to the board
+    def symmetries(self):
+        return [(False, False, False)]
+
+    # Return a two-dimensional list of the cells in view; the whole board is never built
+    def view_cells(self):
+        row_range, column_range = self.view()
+        return [[self.stones.get((row_index, column_index), " ") for column_index in column_range]
+                for row_index in row_range]
+
+    # Return the ranges of rows and columns around the occupied cells, at most 'VIEW_SIZE' around the last move
+    def view(self):
+        if self.move_stack:
+            row_centre, column_centre, _ = self.move_stack[-1]
+        else:
+            row_centre, column_centre = len(self.rows) // 2, len(self.columns) // 2
+        ranges = []
+        for centre, indices, coordinate in ((row_centre, self.rows, 0), (column_centre, self.columns, 1)):
+            lowest = min((cell[coordinate] for cell in self.stones), default=centre) - 1
+            highest = max((cell[coordinate] for cell in self.stones), default=centre) + 1
+            lowest = max(lowest, centre - self.VIEW_SIZE // 2, indices.start)
+            highest = min(highest, centre + self.VIEW_SIZE // 2, indices.stop - 1)
+            ranges.append(range(lowest, highest + 1))
+        return ranges
+
+    # Overload string representation with only the cells in view and their row and column numbers
+    def __str__(self):
+        row_range, column_range = self.view()
+        width = len(str(column_range.stop))
+        lines = ["\t" + " ".join(f"{self.stones.get((row_index, column_index), '.'):>{width}}"
+                                 for column_index in column_range) + f"  {row_index + 1}" for row_index in row_range]
+        lines.append("\t" + " ".join(f"{column_index + 1:>{width}}" for column_index in column_range))
+        return "\n".join(lines)
+
+    # Return the cells within the candidate radius of a cell that are on the board
+    def neighbourhood(self, row_index, column_index):
+        radius = self.CANDIDATE_RADIUS
+        return [(row, column) for row in range(max(row_index - radius, self.rows.start),
+                                               min(row_index + radius + 1, self.rows.stop))
+                for column in range(max(column_index - radius, self.columns.start),
+                                    min(column_index + radius + 1, self.columns.stop))]
+
+    # Place a symbol in a cell and update the candidate moves, symbol counts, hashes, and line counts
+    def place_symbol(self, row_index, column_index, symbol):
+        self.stones[(row_index, column_index)] = symbol
+        self.move_count += 1
+        for cell in self.neighbourhood(row_index, column_index):
+            self.candidate_counts[cell] = self.candidate_counts.get(cell, 0) + 1
+        self.symbol_counts[symbol] = self.symbol_counts.get(symbol, 0) + 1
+        self.move_stack.append((row_index, column_index, symbol))
+        self.position_hash ^= self.symmetric_cell_keys(row_index, column_index, symbol)[0]
+        self.symmetry_hashes = [self.position_hash]
+        self.count_placed_symbol(row_index, column_index, symbol)
+
+    # Remove the most recently placed symbol and restore the candidate moves, symbol counts, hashes, and line counts
+    def remove_symbol(self):
+        row_index, column_index, symbol = self.move_stack.pop()
+        del self.stones[(row_index, column_index)]
+        self.move_count -= 1
+        for cell in self.neighbourhood(row_index, column_index):
+            self.candidate_counts[cell] -= 1
+            if not self.candidate_counts[cell]:
+                del self.candidate_counts[cell]
+        self.symbol_counts[symbol] -= 1
+        self.position_hash ^= self.symmetric_cell_keys(row_index, column_index, symbol)[0]
+        self.symmetry_hashes = [self.position_hash]
+        self.count_removed_symbol(row_index, column_index, symbol)
+        return row_index, column_index, symbol
+
+    # Return the blank cells within the candidate radius of a placed symbol, or the centre cell of an empty grid
+    def legal_moves(self):
+        if not self.stones:
+            return [(len(self.rows) // 2, len(self.columns) // 2)]
+        return [cell for cell in self.candidate_counts if cell not in self.stones]
+
+    # Return the number of consecutive symbols from a cell in one direction, not counting the cell itself
+    def run_length(self, row_index, column_index, row_step, column_step, symbol):
+        length = 0
+        for i in range(1, self.win_length):
+            if self.stones.get((row_index + i * row_step, column_index + i * column_step)) != symbol:
+                break
+            length += 1
+        return length
+
+    # Return true if the symbol placed in a cell would make a run of the win length in the direction
+    def is_win(self, row_index, column_index, symbol, direction):
+        row_step, column_step = WinningLines.DIRECTIONS[direction]
+        return (1 + self.run_length(row_index, column_index, row_step, column_step, symbol)
+                + self.run_length(row_index, column_index, -row_step, -column_step, symbol)) >= self.win_length
+
+    # Return true if each element of a row has been occupied by a player's symbol
+    def is_horizontal_win(self, row_index, column_index, symbol):
+        return self.is_win(row_index, column_index, symbol, WinningLines.HORIZONTAL)
+
+    # Return true if each element of a column has been occupied by a player's symbol
+    def is_vertical_win(self, row_index, column_index, symbol):
+        return self.is_win(row_index, column_index, symbol, WinningLines.VERTICAL)
+
+    # Return true if each element of a left diagonal has been occupied by a player's symbol
+    def is_left_diagonal_win(self, row_index, column_index, symbol):
+        return self.is_win(row_index, column_index, symbol, WinningLines.LEFT_DIAGONAL)
+
+    # Return true if each element of a right diagonal has been occupied by a player's symbol
+    def is_right_diagonal_win(self, row_index, column_index, symbol):
+        return self.is_win(row_index, column_index, symbol, WinningLines.RIGHT_DIAGONAL)
+
+    # Return true if each element of a row, column, or diagonal has been occupied by a player's symbol
+    def has_victory(self, row_index, column_index, symbol):
+        return any(self.is_win(row_index, column_index, symbol, direction)
+                   for direction in range(len(WinningLines.DIRECTIONS)))
+
+
+# Create a grid for the given board settings using the list-backed, bitboard-backed, or sparse classes
+# Sparse grids do not support gravity; return grid object
+def create_grid(row_count, column_count, consecutive_win_length, gravity_enabled, backend="list"):
+    if backend == "sparse":
+        if gravity_enabled:
+            raise ValueError("sparse grids do not support gravity")
+        return SparseGrid(row_count, column_count, consecutive_win_length)
+    if backend == "bitboard":
+        grid_classes = (BitboardGravityDisabled, BitboardGravityEnabled)
+    else:
+        grid_classes = (GravityDisabled, GravityEnabled)
+    return grid_classes[int(gravity_enabled)](row_count, column_count, consecutive_win_length)
+
+
+# Rebuild a grid from the tuple returned by 'Grid.serialize'; return grid object
+def deserialize_grid(data):
+    row_count, column_count, consecutive_win_length, gravity_enabled, backend, moves = data
+    grid = create_grid(row_count, column_count, consecutive_win_length, gravity_enabled, backend)
+    for row_index, column_index, symbol in moves:
+        grid.make_move(row_index, column_index, symbol)
+    return grid
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    EXACT, LOWER_BOUND, UPPER_BOUND = range(3)
+
+    # Initialize a fixed number of slots indexed by position hash; each slot holds at most one entry
+    def __init__(self, size=2 ** 18):
+        self.size = size
+        self.entries = [None] * size
+        self.generation = 0
+
+    # Start a new search so that entries left over from earlier searches can be replaced first
+    def new_search(self):
+        self.generation += 1
+
+    # Return the entry (hash, depth, score, flag, move, generation) stored for a position hash, or None if absent
+    def probe(self, position_hash):
+        entry = self.entries[position_hash % self.size]
+        if entry is not None and entry[0] == position_hash:
+            return entry
+        return None
+
+    # Store a search result, replacing the slot's entry if it is stale, for the same position, or searched less deeply
+    def store(self, position_hash, depth, score, flag, move):
+        index = position_hash % self.size
+        entry = self.entries[index]
+        if entry is None or entry[0] == position_hash or entry[5] != self.generation or depth >= entry[1]:
+            self.entries[index] = (position_hash, depth, score, flag, move, self.generation)
+
+
+class AlphaBetaSearch:
+    WIN_SCORE = 1000000000
+    LINE_WEIGHTS = [0] + [4 ** count for count in range(64)]
+
+    # Initialize search budget per move and the transposition table shared by consecutive searches
+    def __init__(self, time_limit=1.0, node_limit=None, table_size=2 ** 18):
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.table = TranspositionTable(table_size)
+        self.nodes = 0
+        self.deadline = 0
+        self.root_move = None
+        self.root_moves = None
+        self.best_score = 0
+        self.depth_results = {}
+
+    # Raise a timeout if the time or node budget of the current search has been used up
+    def check_budget(self):
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchTimeout
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+    # Return true if a score is a proven win or loss rather than a heuristic estimate
+    def is_decisive(self, score):
+        return abs(score) > self.WIN_SCORE // 2
+
+    # Convert a win or loss score between distance from the root and distance from the stored position
+    def score_to_table(self, score, ply):
+        if self.is_decisive(score):
+            return score + ply if score > 0 else score - ply
+        return score
+
+    def score_from_table(self, score, ply):
+        if self.is_decisive(score):
+            return score - ply if score > 0 else score + ply
+        return score
+
+    # Return the transposition table key of a position and the symbol to move
+    # The key of the cell (-1, -1), which is on no board, marks the symbol to move
+    def table_key(self, grid, symbol):
+        return grid.canonical_hash() ^ zobrist_key(-1, -1, symbol)
+
+    # Return a move on a grid mapped onto the canonical position, the orientation in which table moves are stored
+    # Positions that a symmetry maps onto each other share table entries, so their moves must share an orientation
+    def move_to_table(self, grid, move):
+        return grid.transform_cell(*move, grid.canonical_symmetry())
+
+    # Return a move stored in the table mapped from the canonical position back onto the grid
+    def move_from_table(self, grid, move):
+        return grid.inverse_transform_cell(*move, grid.canonical_symmetry())
+
+    # Return a heuristic score of a position for the symbol to move when the depth limit is reached
+    # Every winning line that only one symbol occupies is worth four times as much for each symbol in it
+    def evaluate(self, grid, symbol, opponent_symbol):
+        score = 0
+        for open_lines, sign in ((grid.open_lines.get(symbol), 1), (grid.open_lines.get(opponent_symbol), -1)):
+            if open_lines is not None:
+                score += sign * sum(self.LINE_WEIGHTS[count] * len(lines) for count, lines in enumerate(open_lines))
+        return max(-self.WIN_SCORE // 4, min(self.WIN_SCORE // 4, score))
+
+    # Return legal moves with the transposition table's best move first, followed by moves that create the most
+    # winning moves for either symbol, and then by moves closest to the centre
+    def order_moves(self, grid, legal_moves, table_move):
+        row_centre = (grid.rows.stop - 1) / 2
+        column_centre = (grid.columns.stop - 1) / 2
+        threat_counts = {}
+        for symbol in grid.placed_symbols():
+            for cell, winning_cells in grid.threat_cells(symbol).items():
+                threat_counts[cell] = threat_counts.get(cell, 0) + len(winning_cells)
+        ordered_moves = sorted(legal_moves, key=lambda move: (-threat_counts.get(move, 0), abs(move[0] - row_centre)
+                                                              + abs(move[1] - column_centre)))
+        if table_move in legal_moves:
+            ordered_moves.remove(table_move)
+            ordered_moves.insert(0, table_move)
+        return ordered_moves
+
+    # Return the negamax score of the position for the symbol to move, searching the given number of plies
+    def negamax(self, grid, depth, alpha, beta, ply, symbol, opponent_symbol):
+        self.nodes += 1
+        self.check_budget()
+        legal_moves = grid.legal_moves()
+        if not legal_moves:
+            return 0
+        # Win immediately if possible
+        winning_cells = grid.winning_cells(symbol)
+        for move in legal_moves:
+            if move in winning_cells:
+                if ply == 0:
+                    self.root_move = move
+                return self.WIN_SCORE - ply
+        if depth == 0:
+            return self.evaluate(grid, symbol, opponent_symbol)
+        # Use a stored result of the same position and symbol to move if it was searched at least as deeply
+        original_alpha = alpha
+        position_hash = self.table_key(grid, symbol)
+        entry = self.table.probe(position_hash)
+        table_move = None
+        if entry is not None:
+            table_move = self.move_from_table(grid, entry[4])
+            if entry[1] >= depth and ply > 0:
+                score = self.score_from_table(entry[2], ply)
+                if entry[3] == TranspositionTable.EXACT:
+                    return score
+                if entry[3] == TranspositionTable.LOWER_BOUND:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+        # Block the opponent's immediate wins; two or more of them cannot all be blocked
+        opponent_winning_cells = grid.winning_cells(opponent_symbol)
+        threats = [move for move in legal_moves if move in opponent_winning_cells]
+        if len(threats) > 1 and ply > 0:
+            return -(self.WIN_SCORE - ply - 1)
+        moves = threats or self.order_moves(grid, legal_moves, table_move)
+        # Only search the root moves assigned to this search, e.g. by a parallel worker
+        if ply == 0 and self.root_moves is not None:
+            moves = [move for move in moves if move in self.root_moves]
+            if not moves:
+                return -self.WIN_SCORE
+        best_score = -self.WIN_SCORE - 1
+        best_move = moves[0]
+        for move in moves:
+            grid.make_move(*move, symbol)
+            score = -self.negamax(grid, depth - 1, -beta, -alpha, ply + 1, opponent_symbol, symbol)
+            grid.undo_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        if ply == 0:
+            self.root_move = best_move
+        if best_score <= original_alpha:
+            flag = TranspositionTable.UPPER_BOUND
+        elif best_score >= beta:
+            flag = TranspositionTable.LOWER_BOUND
+        else:
+            flag = TranspositionTable.EXACT
+        self.table.store(position_hash, depth, self.score_to_table(best_score, ply), flag,
+                         self.move_to_table(grid, best_move))
+        return best_score
+
+    # Search with iterative deepening until the position is solved or the budget runs out; return the best move
+    # If root moves are given, only those moves are considered and 'best_score' holds the score of the returned move
+    # The score and move of each completed depth are kept in 'depth_results'
+    def best_move(self, grid, symbol, opponent_symbol, root_moves=None):
+        legal_moves = grid.legal_moves()
+        self.root_moves = root_moves
+        self.best_score = 0
+        self.depth_results = {}
+        self.nodes = 0
+        if len(legal_moves) == 1:
+            return legal_moves[0]
+        self.table.new_search()
+        self.deadline = time.perf_counter() + self.time_limit
+        best_move = self.order_moves(grid, root_moves or legal_moves, None)[0]
+        move_stack_height = len(grid.move_stack)
+        for depth in range(1, len(grid.free_cells) + 1):
+            try:
+                score = self.negamax(grid, depth, -self.WIN_SCORE - 1, self.WIN_SCORE + 1, 0, symbol, opponent_symbol)
+            except SearchTimeout:
+                # Take back the moves of the unfinished iteration and keep the last completed iteration's move
+                while len(grid.move_stack) > move_stack_height:
+                    grid.undo_move()
+                break
+            self.best_score = score
+            if self.root_move is not None:
+                best_move = self.root_move
+            self.depth_results[depth] = (score, best_move)
+            if self.is_decisive(score):
+                break
+        return best_move
+
+
+# Search a subset of root moves of a serialized grid in a worker process
+# Return the score and move of each completed depth, and the number of nodes searched
+def search_root_moves(grid_data, symbol, opponent_symbol, root_moves, time_limit, node_limit):
+    grid = deserialize_grid(grid_data)
+    search = AlphaBetaSearch(time_limit, node_limit)
+    search.best_move(grid, symbol, opponent_symbol, root_moves)
+    return search.depth_results, search.nodes
+
+
+class OpeningBook:
+    MAGIC = b"MNKBOOK1"
+    HEADER = struct.Struct("<8sBBBBQ")
+    SLOT = struct.Struct("<Qb")
+    # Book positions are hashed with these symbols for the first and second player, whatever symbols are played
+    ROLE_SYMBOLS = ["X", "O"]
+
+    # Open a book file written by 'book.py' as a read-only memory map and read its header
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, row_count, column_count, win_length, gravity_enabled, slot_count = self.HEADER.unpack_from(self.data)
+        if magic != self.MAGIC:
+            raise ValueError(f"'{path}' is not an opening book file")
+        self.settings = (row_count, column_count, win_length, gravity_enabled)
+        self.slot_count = slot_count
+
+    # Return the stored value of a position hash, or None if the position is not in the book
+    # Values are from the view of the player to move: 0 is a tie, 127 - n a win and n - 127 a loss on the n-th move
+    def lookup(self, position_hash):
+        position_hash = position_hash or 1
+        slot_index = position_hash % self.slot_count
+        while True:
+            key, value = self.SLOT.unpack_from(self.data, self.HEADER.size + slot_index * self.SLOT.size)
+            if key == position_hash:
+                return value
+            if key == 0:
+                return None
+            slot_index = (slot_index + 1) % self.slot_count
+
+    # Return the move whose resulting position is worst for the opponent, or None unless every such position is known
+    def best_move(self, grid, symbol):
+        first_symbol = grid.move_stack[0][2] if grid.move_stack else symbol
+        symbol_map = {first_symbol: self.ROLE_SYMBOLS[0]}
+        symbol_map.update((placed_symbol, self.ROLE_SYMBOLS[1]) for placed_symbol in grid.placed_symbols()
+                          if placed_symbol != first_symbol)
+        symbol_map.setdefault(symbol, self.ROLE_SYMBOLS[grid.move_count % 2])
+        hashes = grid.symmetric_hashes(symbol_map)
+        best_value = best_move = None
+        for move in grid.legal_moves():
+            if grid.has_victory(*move, symbol):
+                return move
+            if len(grid.free_cells) == 1:
+                value = 0
+            else:
+                keys = grid.symmetric_cell_keys(*move, symbol_map[symbol])
+                value = self.lookup(min(position_hash ^ key for position_hash, key in zip(hashes, keys)))
+                if value is None:
+                    return None
+            if best_value is None or value < best_value:
+                best_value = value
+                best_move = move
+        return best_move
+
+    # Close the memory map of the book file
+    def close(self):
+        self.data.close()
+
+
+# Return the path of the opening book file for the given board settings
+def book_path(row_count, column_count, consecutive_win_length, gravity_enabled, directory="books"):
+    return os.path.join(directory, f"{row_count}-{column_count}-{consecutive_win_length}-{int(gravity_enabled)}.book")
+
+
+# Return the opening book for the given board settings, opening it on first use, or None if there is no book file
+def open_book(row_count, column_count, consecutive_win_length, gravity_enabled):
+    settings = (row_count, column_count, consecutive_win_length, int(gravity_enabled))
+    if settings not in OPENING_BOOKS:
+        try:
+            OPENING_BOOKS[settings] = OpeningBook(book_path(*settings))
+        except FileNotFoundError:
+            OPENING_BOOKS[settings] = None
+    return OPENING_BOOKS[settings]
+
+
+OPENING_BOOKS = {}
+
+
+class RecordStore:
+    BATCH_SIZE = 64
+    TIMEOUT = 30.0
+    RESULT_FIELDS = {"win": (1, 0, 1), "loss": (0, 1, 1), "tie": (0, 0, 1)}
+
+    # Initialize a store of every player's record in one SQLite database file, opened when first needed
+    # Results are kept as pending increments and written in batches; records are read once and cached
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+        self.cache = {}
+        self.pending = {}
+        self.pending_count = 0
+
+    # Open the database and create the record table if needed; return connection object
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, timeout=self.TIMEOUT, isolation_level=None)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS records (name TEXT PRIMARY KEY, wins INTEGER NOT NULL, "
+                                    "losses INTEGER NOT NULL, total_games INTEGER NOT NULL)")
+        return self.connection
+
+    # Return a player's record read from an old player file, or None if the file does not exist
+    def read_text_record(self, name):
+        try:
+            with open(f"{name}.txt", "r") as file:
+                return tuple(int(score) for score in file)
+        except FileNotFoundError:
+            return None
+
+    # Copy a player's record from an old player file into the database unless the player already has a record there
+    def migrate_text_record(self, name):
+        record = self.read_text_record(name)
+        if record is not None:
+            self.connect().execute("INSERT OR IGNORE INTO records VALUES (?, ?, ?, ?)", (name, *record))
+
+    # Return a player's record including results not yet written; read and cache it on first use
+    def load(self, name):
+        if name not in self.cache:
+            connection = self.connect()
+            query = "SELECT wins, losses, total_games FROM records WHERE name = ?"
+            row = connection.execute(query, (name,)).fetchone()
+            if row is None:
+                self.migrate_text_record(name)
+                row = connection.execute(query, (name,)).fetchone()
+            self.cache[name] = list(row or (0, 0, 0))
+        return self.cache[name]
+
+    # Add a result to a player's cached record and pending increments; write the batch when it is large enough
+    def add_result(self, name, result):
+        record = self.load(name)
+        increments = self.pending.setdefault(name, [0, 0, 0])
+        for field_index, increment in enumerate(self.RESULT_FIELDS[result]):
+            record[field_index] += increment
+            increments[field_index] += increment
+        self.pending_count += 1
+        if self.pending_count >= self.BATCH_SIZE:
+            self.flush()
+
+    # Write pending increments in one transaction so that processes sharing the file add to each other's results
+    # Cached records are refreshed with the totals written by every process
+    def flush(self):
+        if not self.pending:
+            return
+        connection = self.connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for name, increments in self.pending.items():
+                connection.execute("INSERT INTO records VALUES (?, ?, ?, ?) ON CONFLICT(name) DO UPDATE SET "
+                                   "wins = wins + excluded.wins, losses = losses + excluded.losses, "
+                                   "total_games = total_games + excluded.total_games", (name, *increments))
+                self.cache[name] = list(connection.execute("SELECT wins, losses, total_games FROM records "
+                                                           "WHERE name = ?", (name,)).fetchone())
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self.pending = {}
+        self.pending_count = 0
+
+    # Write pending increments and close the database
+    def close(self):
+        self.flush()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
 
 
 class Player:
-    # Initialize player's name and symbol; load record from player file if it exists
+    RECORD_STORE = RecordStore("records.db")
+
+    # Initialize player's name and symbol; the record is loaded from the record store when first needed
     def __init__(self, level, name, symbol):
         self.level = level
         self.name = name
         self.symbol = symbol
-        try:
-            with open(f"{self.name}.txt", "r") as file:
-                record = [int(score) for score in file]
-        except FileNotFoundError:
-            record = [0, 0, 0]
-        self.wins, self.losses, self.total_games = record
 
-    # Save record to new or existing player file
+    # Return the number of games the player has won
+    @property
+    def wins(self):
+        return self.RECORD_STORE.load(self.name)[0]
+
+    # Return the number of games the player has lost
+    @property
+    def losses(self):
+        return self.RECORD_STORE.load(self.name)[1]
+
+    # Return the number of games the player has finished
+    @property
+    def total_games(self):
+        return self.RECORD_STORE.load(self.name)[2]
+
+    # Write the player's pending results to the record store
     def save_record(self):
-        record = (self.wins, self.losses, self.total_games)
-        with open(f"{self.name}.txt", "w") as file:
-            file.write("\n".join(str(score) for score in record))
+        self.RECORD_STORE.flush()
 
     # Print player's record to the console
     def display_record(self):
@@ -273,11 +1281,7 @@ class Player:
 
     # Update player's record based on result
     def update_record(self, result):
-        if result == "win":
-            self.wins += 1
-        elif result == "loss":
-            self.losses += 1
-        self.total_games += 1
+        self.RECORD_STORE.add_result(self.name, result)
 
 
 class Local(Player):
@@ -300,42 +1304,537 @@ class Local(Player):
             else:
                 row = validate_input(row_prompt, int, [row_index + 1 for row_index in grid.rows]) - 1
                 column = validate_input(column_prompt, int, [column_index + 1 for column_index in grid.columns]) - 1
-                if (row, column) in legal_moves:
+                if (row, column) in grid.free_cells:
                     return row, column
                 print("The cell you selected is occupied.")
 
 
 class CPU(Player):
-    # Initialize CPU player object with the inherited constructor
+    SEARCH_TIME_LIMIT = 1.0
+    WORKER_COUNT = 1
+
+    # Initialize CPU player object with the inherited constructor; create a search if the level requires one
     def __init__(self, level, name, symbol):
         super().__init__(level, name, symbol)
+        self.rng = random
+        self.worker_count = self.WORKER_COUNT
+        self.executor = None
+        self.search = None
+        if Game.CPU_LEVELS[self.level] == "perfect":
+            self.search = AlphaBetaSearch(self.SEARCH_TIME_LIMIT)
 
-    # Validate CPU player's turn by verifying with the grid's legal moves; return tuple with row and column
-    def take_turn(self, grid):
+    # Return the process pool used by parallel searches, starting it on first use
+    def worker_pool(self):
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.worker_count)
+        return self.executor
+
+    # Shut down the process pool of parallel searches if it has been started
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    # Split the root moves between worker processes that each search their share; return the best move found
+    # Heuristic scores are only compared at the deepest depth every worker completed, since scores of different
+    # depths are not comparable; a decisive score holds at every depth after the one that proved it
+    def parallel_best_move(self, grid):
         legal_moves = grid.legal_moves()
-        print(visual_separator(f"{self.name} ({self.symbol})"))
+        if len(legal_moves) == 1:
+            return legal_moves[0]
+        # Search the move stored by earlier searches of this position first
+        table_key = self.search.table_key(grid, self.symbol)
+        entry = self.search.table.probe(table_key)
+        table_move = self.search.move_from_table(grid, entry[4]) if entry is not None else None
+        ordered_moves = self.search.order_moves(grid, legal_moves, table_move)
+        grid_data = grid.serialize()
+        opponent_symbol = self.opponent_symbol(grid)
+        worker_count = min(self.worker_count, len(ordered_moves))
+        # The node budget is split between the workers, so a parallel search does as much work as a serial one
+        node_limit = self.search.node_limit
+        if node_limit is not None:
+            node_limit = max(1, node_limit // worker_count)
+        futures = [self.worker_pool().submit(search_root_moves, grid_data, self.symbol, opponent_symbol,
+                                             ordered_moves[worker_index::worker_count], self.search.time_limit,
+                                             node_limit)
+                   for worker_index in range(worker_count)]
+        results = [future.result() for future in futures]
+        self.search.nodes = sum(nodes for _, nodes in results)
+        depth_results = [worker_results for worker_results, _ in results if worker_results]
+        # Keep the serial ordering's first move if a worker did not complete any depth
+        if len(depth_results) < len(results):
+            return ordered_moves[0]
+        last_depths = [max(worker_results) for worker_results in depth_results]
+        final_results = [worker_results[depth] for worker_results, depth in zip(depth_results, last_depths)]
+        # A proven win is taken whatever depth proved it
+        wins = [(score, move, depth) for (score, move), depth in zip(final_results, last_depths)
+                if self.search.is_decisive(score) and score > 0]
+        if wins:
+            score, best_move, depth = max(wins)
+        else:
+            open_depths = [depth for (score, _), depth in zip(final_results, last_depths)
+                           if not self.search.is_decisive(score)]
+            depth = min(open_depths) if open_depths else max(last_depths)
+            score, best_move = max(worker_results.get(depth, final_result)
+                                   for worker_results, final_result in zip(depth_results, final_results))
+        self.search.table.store(table_key, depth, self.search.score_to_table(score, 0), TranspositionTable.EXACT,
+                                self.search.move_to_table(grid, best_move))
+        return best_move
+
+    # Return the opponent's symbol on the grid, or a stand-in symbol if the opponent has not moved yet
+    def opponent_symbol(self, grid):
+        opponent_symbols = grid.placed_symbols() - {self.symbol}
+        if opponent_symbols:
+            return opponent_symbols.pop()
+        return next(symbol for symbol in Game.SYMBOL_DEFAULTS + Game.LATIN_CHARACTERS if symbol != self.symbol)
+
+    # Return the move of the opening book for the grid's settings, or None if the position is not in a book
+    def book_move(self, grid):
+        book = open_book(grid.rows.stop, grid.columns.stop, grid.win_length, isinstance(grid, GravityEnabled))
+        if book is None:
+            return None
+        return book.best_move(grid, self.symbol)
+
+    # Select a move according to the level of the CPU player; return tuple with row and column
+    def select_move(self, grid):
+        legal_moves = grid.legal_moves()
+        # Search the game tree if the selected level of the CPU player is perfect and the opening book has no move
+        if self.search is not None:
+            book_move = self.book_move(grid)
+            if book_move is not None:
+                return book_move
+            if self.worker_count > 1:
+                return self.parallel_best_move(grid)
+            return self.search.best_move(grid, self.symbol, self.opponent_symbol(grid))
         # Find optimal moves if the selected level of the CPU player is hard
         if self.level > 0:
             # Check for a potential winning move
+            winning_cells = grid.winning_cells(self.symbol)
             for row_index, column_index in legal_moves:
-                if grid.has_victory(row_index, column_index, self.symbol):
-                    print(f"Row: {row_index + 1}\nColumn: {column_index + 1}")
+                if (row_index, column_index) in winning_cells:
                     return row_index, column_index
             # Check for a potential blocking move
-            opponent_symbols = set(grid.cells[row_index][column_index]
-                                   for column_index in grid.columns for row_index in grid.rows
-                                   if grid.cells[row_index][column_index] not in (" ", self.symbol))
+            opponent_symbols = grid.placed_symbols() - {self.symbol}
+            opponent_winning_cells = set().union(*(grid.winning_cells(symbol) for symbol in opponent_symbols))
             for row_index, column_index in legal_moves:
-                for opponent_symbol in opponent_symbols:
-                    if grid.has_victory(row_index, column_index, opponent_symbol):
-                        print(f"Row: {row_index + 1}\nColumn: {column_index + 1}")
-                        return row_index, column_index
+                if (row_index, column_index) in opponent_winning_cells:
+                    return row_index, column_index
+            # Check for a move that creates two winning moves at once, which cannot both be blocked
+            double_threat_moves = grid.double_threat_moves(self.symbol)
+            if double_threat_moves:
+                return self.rng.choice(double_threat_moves)
+            # Check for a move that prevents the opponent from creating two winning moves at once
+            for opponent_symbol in opponent_symbols:
+                double_threat_moves = grid.double_threat_moves(opponent_symbol)
+                if double_threat_moves:
+                    return self.rng.choice(double_threat_moves)
         # Randomly select a legal move if the selected level is easy or no optimal move is found
-        row_index, column_index = random.choice(legal_moves)
+        return self.rng.choice(legal_moves)
+
+    # Validate CPU player's turn by verifying with the grid's legal moves; return tuple with row and column
+    def take_turn(self, grid):
+        print(visual_separator(f"{self.name} ({self.symbol})"))
+        row_index, column_index = self.select_move(grid)
         print(f"Row: {row_index + 1}\nColumn: {column_index + 1}")
         return row_index, column_index
 
 
+class MonteCarloNode:
+    __slots__ = ("move", "parent", "symbol", "children", "untried_moves", "visits", "score", "winner", "terminal")
+
+    # Initialize a tree node reached by the given symbol playing the given move
+    def __init__(self, move, parent, symbol):
+        self.move = move
+        self.parent = parent
+        self.symbol = symbol
+        self.children = []
+        self.untried_moves = None
+        self.visits = 0
+        self.score = 0.0
+        self.winner = None
+        self.terminal = False
+
+    # Return the child with the highest upper confidence bound for trees (UCT)
+    def select_child(self, exploration):
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.score / child.visits
+                   + exploration * math.sqrt(log_visits / child.visits))
+
+
+class MonteCarloCPU(CPU):
+    EXPLORATION = math.sqrt(2)
+    PLAYOUT_LIMIT = None
+
+    # Initialize Monte Carlo CPU player object with the inherited constructor and an empty search tree
+    def __init__(self, level, name, symbol):
+        super().__init__(level, name, symbol)
+        self.time_limit = self.SEARCH_TIME_LIMIT
+        self.playout_limit = self.PLAYOUT_LIMIT
+        self.root = None
+        self.root_history = []
+
+    # Return the root of the search tree for the grid, reusing the subtree of the moves played since the last turn
+    def find_root(self, grid, opponent_symbol):
+        history_length = len(self.root_history)
+        if self.root is not None and grid.move_stack[:history_length] == self.root_history:
+            node = self.root
+            for row_index, column_index, _ in grid.move_stack[history_length:]:
+                node = next((child for child in node.children if child.move == (row_index, column_index)), None)
+                if node is None:
+                    break
+            # The subtree is only valid if it was built with the symbol the opponent actually plays
+            if node is not None and node.symbol == opponent_symbol:
+                node.parent = None
+                return node
+        return MonteCarloNode(None, None, opponent_symbol)
+
+    # Play random moves until the game is finished and take them back afterwards; return winning symbol or None
+    def playout(self, grid, symbol, opponent_symbol):
+        winner = None
+        move_count = 0
+        while True:
+            legal_moves = grid.legal_moves()
+            if not legal_moves:
+                break
+            move = self.rng.choice(legal_moves)
+            if grid.has_victory(*move, symbol):
+                winner = symbol
+                break
+            grid.make_move(*move, symbol)
+            move_count += 1
+            symbol, opponent_symbol = opponent_symbol, symbol
+        for _ in range(move_count):
+            grid.undo_move()
+        return winner
+
+    # Select, expand, simulate, and backpropagate once, restoring the grid afterwards
+    def run_iteration(self, grid, root, opponent_symbols):
+        node = root
+        move_count = 0
+        # Descend through fully expanded nodes
+        while not node.terminal and not node.untried_moves and node.children:
+            node = node.select_child(self.EXPLORATION)
+            grid.make_move(*node.move, node.symbol)
+            move_count += 1
+        if node.untried_moves is None and not node.terminal:
+            node.untried_moves = grid.legal_moves()
+            self.rng.shuffle(node.untried_moves)
+        # Expand one untried move
+        if not node.terminal and node.untried_moves:
+            move = node.untried_moves.pop()
+            child = MonteCarloNode(move, node, opponent_symbols[node.symbol])
+            if grid.has_victory(*move, child.symbol):
+                child.winner = child.symbol
+                child.terminal = True
+            grid.make_move(*move, child.symbol)
+            move_count += 1
+            child.terminal = child.terminal or grid.is_full()
+            node.children.append(child)
+            node = child
+        # Simulate the rest of the game unless the node already ends it
+        if node.terminal:
+            winner = node.winner
+        else:
+            winner = self.playout(grid, opponent_symbols[node.symbol], node.symbol)
+        for _ in range(move_count):
+            grid.undo_move()
+        # Score each node from the point of view of the symbol that moved into it
+        while node is not None:
+            node.visits += 1
+            if winner == node.symbol:
+                node.score += 1
+            elif winner is None:
+                node.score += 0.5
+            node = node.parent
+
+    # Run playouts from the given root until the playout or time budget is used up; return the root
+    def grow_tree(self, grid, root):
+        opponent_symbol = root.symbol
+        opponent_symbols = {self.symbol: opponent_symbol, opponent_symbol: self.symbol}
+        deadline = time.perf_counter() + self.time_limit
+        playout_count = 0
+        while True:
+            self.run_iteration(grid, root, opponent_symbols)
+            playout_count += 1
+            if self.playout_limit is not None:
+                if playout_count >= self.playout_limit:
+                    break
+            elif time.perf_counter() > deadline:
+                break
+        return root
+
+    # Run independent searches in worker processes and merge their root visit counts; return the most visited move
+    def parallel_select_move(self, grid):
+        grid_data = grid.serialize()
+        playout_limit = self.playout_limit
+        if playout_limit is not None:
+            playout_limit = max(1, playout_limit // self.worker_count)
+        futures = [self.worker_pool().submit(count_root_visits, grid_data, self.level, self.symbol, self.time_limit,
+                                             playout_limit, self.rng.getrandbits(32))
+                   for _ in range(self.worker_count)]
+        visits = {}
+        for future in futures:
+            for move, move_visits in future.result().items():
+                visits[move] = visits.get(move, 0) + move_visits
+        self.root = None
+        return max(visits, key=visits.get)
+
+    # Search the game tree and keep the subtree of the chosen move; return the most visited move
+    def select_move(self, grid):
+        book_move = self.book_move(grid)
+        if book_move is not None:
+            self.root = None
+            return book_move
+        if self.worker_count > 1:
+            return self.parallel_select_move(grid)
+        root = self.grow_tree(grid, self.find_root(grid, self.opponent_symbol(grid)))
+        best_child = max(root.children, key=lambda child: child.visits)
+        # Keep the subtree of the chosen move so the search carries over into the next turn
+        best_child.parent = None
+        self.root = best_child
+        self.root_history = grid.move_stack + [(*best_child.move, self.symbol)]
+        return best_child.move
+
+
+# Grow an independent Monte Carlo search tree in a worker process; return the visit count of each root move
+def count_root_visits(grid_data, level, symbol, time_limit, playout_limit, seed):
+    grid = deserialize_grid(grid_data)
+    cpu = MonteCarloCPU(level, f"worker {seed}", symbol)
+    cpu.rng = random.Random(seed)
+    cpu.time_limit = time_limit
+    cpu.playout_limit = playout_limit
+    root = cpu.grow_tree(grid, MonteCarloNode(None, None, cpu.opponent_symbol(grid)))
+    return {child.move: child.visits for child in root.children}
+
+
+# Create a CPU player object of the subclass required by the given level; return CPU player object
+def create_cpu(level, name, symbol):
+    if Game.CPU_LEVELS[level] == "monte carlo":
+        return MonteCarloCPU(level, name, symbol)
+    return CPU(level, name, symbol)
+
+
+class GameRecordWriter:
+    # Initialize a writer that appends one compact JSON line per finished game to a file, opened when first needed
+    # A record holds the board settings, the players' names and symbols, who moved first, the winner, and the moves
+    # Each move is stored as the index 'row * width + column' of the cell the symbol landed in
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    # Return the record of the game on a grid as a dictionary
+    def game_record(self, grid, players, first_player_index, winner_index):
+        column_count = len(grid.columns)
+        return {"board": [len(grid.rows), column_count, grid.win_length, int(isinstance(grid, GravityEnabled))],
+                "players": [[player.name, player.symbol] for player in players], "first": first_player_index,
+                "winner": winner_index,
+                "moves": [row_index * column_count + column_index for row_index, column_index, _ in grid.move_stack]}
+
+    # Append the record of the game on a grid to the file
+    def write(self, grid, players, first_player_index, winner_index):
+        if self.file is None:
+            self.file = open(self.path, "a")
+        self.file.write(json.dumps(self.game_record(grid, players, first_player_index, winner_index),
+                                   separators=(",", ":")) + "\n")
+
+    # Write buffered records and close the file
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# Yield the game records of a file one at a time, so files of any size can be read without holding them in memory
+def read_game_records(path):
+    with open(path, "r") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+# Yield the row index, column index, and symbol of each move of a game record after replaying it on a grid
+# A grid of matching settings can be given to be reset and reused across records; the grid is left in the final position
+def replay_game_record(record, grid=None):
+    row_count, column_count, consecutive_win_length, gravity_enabled = record["board"]
+    if grid is None:
+        grid = create_grid(row_count, column_count, consecutive_win_length, gravity_enabled)
+    grid.reset()
+    symbols = [symbol for _, symbol in record["players"]]
+    for move_index, cell_index in enumerate(record["moves"]):
+        symbol = symbols[(record["first"] + move_index) % 2]
+        row_index, column_index = grid.add_symbol(*divmod(cell_index, column_count), symbol)
+        yield row_index, column_index, symbol
+
+
+class Instrumentation:
+    WIN_CHECKS = ["has_victory", "is_horizontal_win", "is_vertical_win", "is_left_diagonal_win",
+                  "is_right_diagonal_win"]
+
+    # Initialize cumulative counters and the metrics of the current game; per-game summaries are appended to a file
+    # Nothing is measured until 'enable' wraps the measured methods, so disabled instrumentation costs nothing
+    def __init__(self, path=None):
+        self.path = path
+        self.file = None
+        self.counters = collections.Counter()
+        self.patches = []
+        self.game = None
+        self.game_counters = None
+        self.move_depth = 0
+
+    # Replace a method defined by a class with a wrapper made from it, remembering the original to restore it later
+    def patch(self, cls, name, make_wrapper):
+        original = cls.__dict__[name]
+        self.patches.append((cls, name, original))
+        setattr(cls, name, functools.wraps(original)(make_wrapper(original)))
+
+    # Return a function that makes wrappers counting the calls of a method under a counter name
+    def call_counter(self, counter_name):
+        counters = self.counters
+
+        # Return a wrapper of a method that counts its calls
+        def make_wrapper(original):
+            # Count the call and call the method
+            def wrapper(*arguments):
+                counters[counter_name] += 1
+                return original(*arguments)
+            return wrapper
+        return make_wrapper
+
+    # Return a wrapper of a transposition table probe that counts probes and hits
+    def table_probe_wrapper(self, original):
+        counters = self.counters
+
+        # Count the probe, and the hit if an entry is found; return the entry
+        def wrapper(table, position_hash):
+            entry = original(table, position_hash)
+            counters["table_probes"] += 1
+            counters["table_hits"] += entry is not None
+            return entry
+        return wrapper
+
+    # Return a wrapper of an opening book move lookup that counts lookups and hits
+    def book_move_wrapper(self, original):
+        counters = self.counters
+
+        # Count the lookup, and the hit if the book has a move; return the move
+        def wrapper(book, grid, symbol):
+            move = original(book, grid, symbol)
+            counters["book_probes"] += 1
+            counters["book_hits"] += move is not None
+            return move
+        return wrapper
+
+    # Return a wrapper of a search that adds the nodes it searched to the counters
+    def node_counter(self, original):
+        counters = self.counters
+
+        # Run the search and count its nodes; return the search's result
+        def wrapper(search_or_player, *arguments):
+            result = original(search_or_player, *arguments)
+            search = getattr(search_or_player, "search", search_or_player)
+            counters["nodes"] += search.nodes
+            return result
+        return wrapper
+
+    # Return a wrapper of a player's move that records its wall time and the counters it changed
+    # A move made through another measured method is only recorded once
+    def move_timer(self, original):
+        # Time the move and record it in the current game; return the move
+        def wrapper(player, grid):
+            if self.move_depth:
+                return original(player, grid)
+            counters_before = self.counters.copy()
+            self.move_depth += 1
+            start = time.perf_counter()
+            try:
+                move = original(player, grid)
+            finally:
+                self.move_depth -= 1
+            elapsed = time.perf_counter() - start
+            self.record_move(player, elapsed, self.counters - counters_before)
+            return move
+        return wrapper
+
+    # Wrap the grid win checks, searches, transposition tables, opening books, and player moves to measure them
+    def enable(self):
+        if self.patches:
+            return
+        grid_classes = [Grid]
+        for cls in grid_classes:
+            grid_classes.extend(cls.__subclasses__())
+        for cls in dict.fromkeys(grid_classes):
+            for name in self.WIN_CHECKS:
+                if name in cls.__dict__:
+                    self.patch(cls, name, self.call_counter(name))
+        self.patch(TranspositionTable, "probe", self.table_probe_wrapper)
+        self.patch(OpeningBook, "best_move", self.book_move_wrapper)
+        self.patch(AlphaBetaSearch, "best_move", self.node_counter)
+        self.patch(CPU, "parallel_best_move", self.node_counter)
+        self.patch(MonteCarloCPU, "run_iteration", self.call_counter("playouts"))
+        for cls, name in ((Local, "take_turn"), (CPU, "take_turn"), (CPU, "select_move"),
+                          (MonteCarloCPU, "select_move")):
+            self.patch(cls, name, self.move_timer)
+
+    # Restore every wrapped method
+    def disable(self):
+        while self.patches:
+            cls, name, original = self.patches.pop()
+            setattr(cls, name, original)
+
+    # Start collecting the metrics of a game on a grid between players
+    def start_game(self, grid, players):
+        self.game = {"board": [len(grid.rows), len(grid.columns), grid.win_length,
+                               int(isinstance(grid, GravityEnabled))],
+                     "players": [player.name for player in players], "moves": []}
+        self.game_counters = self.counters.copy()
+
+    # Record the wall time and counter changes of a player's move in the current game
+    def record_move(self, player, elapsed, counters):
+        self.counters["moves"] += 1
+        self.counters["move_seconds"] += elapsed
+        if self.game is not None:
+            self.game["moves"].append(dict(counters, player=player.name, seconds=elapsed))
+
+    # Finish the current game, append its summary to the file if there is one, and return the summary
+    # The summary has the counters of the whole game and the wall time, counters, and player of each move
+    def end_game(self, winner_index):
+        game = self.game
+        game["winner"] = winner_index
+        game["totals"] = self.with_rates(self.counters - self.game_counters)
+        self.game = self.game_counters = None
+        self.counters["games"] += 1
+        game["slowest_move_seconds"] = max((move["seconds"] for move in game["moves"]), default=0.0)
+        if self.path is not None:
+            if self.file is None:
+                self.file = open(self.path, "a")
+            self.file.write(json.dumps(game) + "\n")
+            self.file.flush()
+        return game
+
+    # Return a dictionary of counters with the transposition table and opening book hit rates added
+    def with_rates(self, counters):
+        counters = dict(counters)
+        for name in ("table", "book"):
+            probes = counters.get(f"{name}_probes", 0)
+            counters[f"{name}_hit_rate"] = counters.get(f"{name}_hits", 0) / probes if probes else 0.0
+        return counters
+
+    # Return the cumulative counters of every measured game and move, with hit rates added
+    def summary(self):
+        return self.with_rates(self.counters)
+
+    # Write the cumulative counters as a JSON line to the file if there is one, and close it; return the counters
+    def close(self):
+        summary = self.summary()
+        if self.path is not None:
+            if self.file is None:
+                self.file = open(self.path, "a")
+            self.file.write(json.dumps({"cumulative": summary}) + "\n")
+            self.file.close()
+            self.file = None
+        return summary
+
+
 class Game:
     MIN_HEIGHT = MIN_WIDTH = MIN_WIN_LENGTH = 3
     MAX_HEIGHT = MAX_WIDTH = 9
@@ -347,13 +1846,17 @@ class Game:
     MAX_TOTAL_PLAYERS = 2
     LATIN_CHARACTERS = [chr(code_point) for code_point in range(33, 127)] + [""]
     SYMBOL_DEFAULTS = ["X", "O"]
-    CPU_LEVELS = ["easy", "hard"]
+    CPU_LEVELS = ["easy", "hard", "perfect", "monte carlo"]
+    BOARD_BACKEND = "list"
     PLAY_AGAIN_MODES = ["yes", "no"]
+    GAME_RECORD_PATH = "games.jsonl"
 
     # Initialize game variables
     def __init__(self):
         self.play = True
         self.players = []
+        self.game_records = GameRecordWriter(self.GAME_RECORD_PATH)
+        self.instrumentation = None
         self.board = self.set_board_options()
         self.local_player_count = self.set_local_player_count()
 
@@ -396,9 +1899,7 @@ class Game:
             gravity_enabled = self.set_board_gravity()
         else:
             height, width, win_length, gravity_enabled = self.BOARD_MODES_SETTINGS[mode]
-        if gravity_enabled:
-            return GravityEnabled(height, width, win_length)
-        return GravityDisabled(height, width, win_length)
+        return create_grid(height, width, win_length, gravity_enabled, self.BOARD_BACKEND)
 
     # Ask the user for the number of local players; return local player count
     def set_local_player_count(self):
@@ -416,7 +1917,7 @@ class Game:
                 player_level = 1
             else:
                 player_type = "CPU"
-                player_subclass = CPU
+                player_subclass = create_cpu
                 # Set the level of the player if the player is CPU
                 level_options = "  ".join(f"[{mode}] {self.CPU_LEVELS[mode]}" for mode in range(len(self.CPU_LEVELS)))
                 level_prompt = f"Set the level of {player_type} player ({level_options}): "
@@ -471,6 +1972,9 @@ class Game:
             # Randomly determine which player's turn is first
             self.board.reset()
             round_count = random.randint(1, 2)
+            first_player_index = (round_count + 1) % 2
+            if self.instrumentation is not None:
+                self.instrumentation.start_game(self.board, self.players)
             print(visual_separator(self.board))
             # Loop until the game is finished either due to a win or a tie
             while True:
@@ -482,10 +1986,24 @@ class Game:
                 print(visual_separator(self.board))
                 if self.game_finished(row, column, current_player, round_count):
                     break
+            winner_index = round_count % 2 if self.board.has_victory(row, column, current_player.symbol) else None
+            self.game_records.write(self.board, self.players, first_player_index, winner_index)
+            if self.instrumentation is not None:
+                self.instrumentation.end_game(winner_index)
             self.update_all_player_records()
             self.play = self.set_replay_status(self.players[0])
 
 
 if __name__ == "__main__":
     game = Game()
-    game.run()
+    # Measure every game and move if a metrics file is given in the environment
+    if os.environ.get("MNK_METRICS"):
+        game.instrumentation = Instrumentation(os.environ["MNK_METRICS"])
+        game.instrumentation.enable()
+    try:
+        game.run()
+    finally:
+        game.game_records.close()
+        Player.RECORD_STORE.close()
+        if game.instrumentation is not None:
+            game.instrumentation.close()
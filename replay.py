@@ -0,0 +1,74 @@
+import argparse
+import collections
+import json
+
+from main import create_grid, read_game_records, replay_game_record
+
+
+# Return the statistics of a group of games as a dictionary, from the view of the player who moved first
+def group_statistics(counts):
+    game_count = counts["games"]
+    return {"games": game_count,
+            "first_win_rate": counts["first_wins"] / game_count if game_count else 0.0,
+            "second_win_rate": counts["second_wins"] / game_count if game_count else 0.0,
+            "tie_rate": counts["ties"] / game_count if game_count else 0.0,
+            "first_move_advantage": (counts["first_wins"] - counts["second_wins"]) / game_count if game_count else 0.0,
+            "average_length": counts["moves"] / game_count if game_count else 0.0,
+            "mismatches": counts["mismatches"]}
+
+
+# Return the winner of a game record found by replaying its moves and checking each for a victory
+# One grid is kept for each board so that replaying many games does not build a new grid per game
+def replayed_winner(record, grids):
+    board = tuple(record["board"])
+    if board not in grids:
+        grids[board] = create_grid(*board)
+    grid = grids[board]
+    for move_index, (row_index, column_index, symbol) in enumerate(replay_game_record(record, grid)):
+        if grid.has_victory(row_index, column_index, symbol):
+            return (record["first"] + move_index) % 2
+    return None
+
+
+# Compute aggregate statistics of a stream of game records in a single pass, overall and for each board
+# Records are checked against their replayed winner if 'verify' is true; return dictionary of statistics
+def aggregate_statistics(records, verify=False):
+    totals = collections.Counter()
+    boards = collections.defaultdict(collections.Counter)
+    opening_moves = collections.defaultdict(collections.Counter)
+    grids = {}
+    for record in records:
+        board = " ".join(str(setting) for setting in record["board"])
+        winner_index = record["winner"]
+        counts = collections.Counter(games=1, moves=len(record["moves"]))
+        if winner_index is None:
+            counts["ties"] += 1
+        elif winner_index == record["first"]:
+            counts["first_wins"] += 1
+        else:
+            counts["second_wins"] += 1
+        if verify and replayed_winner(record, grids) != winner_index:
+            counts["mismatches"] += 1
+        totals.update(counts)
+        boards[board].update(counts)
+        if record["moves"]:
+            opening_moves[board][record["moves"][0]] += 1
+    statistics = group_statistics(totals)
+    statistics["boards"] = {board: dict(group_statistics(counts),
+                                        opening_moves=dict(opening_moves[board].most_common(3)))
+                            for board, counts in boards.items()}
+    return statistics
+
+
+# Parse the command line and print the aggregate statistics of one or more game record files
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored games and report aggregate statistics.")
+    parser.add_argument("paths", nargs="+", help="files of game records written by the game or simulator")
+    parser.add_argument("--verify", action="store_true", help="replay every game and check its recorded winner")
+    arguments = parser.parse_args()
+    records = (record for path in arguments.paths for record in read_game_records(path))
+    print(json.dumps(aggregate_statistics(records, arguments.verify), indent=2))
+
+
+if __name__ == "__main__":
+    main()
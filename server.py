@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import itertools
+import os
+
+from main import Game, GravityEnabled, Player, create_cpu, create_grid, deserialize_grid
+
+# Levels whose moves take microseconds are chosen in the server process; searches run in the worker pool
+INLINE_LEVELS = ["easy", "hard"]
+RESULTS = {"win": "WIN", "loss": "LOSS", "tie": "TIE"}
+# Every command is answered with one line of words, e.g. 'PLACED 2 2 CPU 1 1' or 'PLACED 3 1 END WIN'
+HELP = ("commands: NEW HEIGHT WIDTH WIN_LENGTH GRAVITY LEVEL FIRST [NAME] | MOVE ROW COLUMN | BOARD | QUIT; "
+        f"LEVEL is 0-{len(Game.CPU_LEVELS) - 1} ({', '.join(Game.CPU_LEVELS)}), FIRST is 0 for you or 1 for the CPU")
+
+
+# Return a CPU player of a level for one session's game in a worker process
+# It is kept between the session's moves so its search tables are reused, but never shared with another session
+@functools.lru_cache(maxsize=16)
+def worker_cpu(session_id, settings, level, symbol, time_limit):
+    cpu = create_cpu(level, f"worker {os.getpid()}", symbol)
+    cpu.time_limit = time_limit
+    if cpu.search is not None:
+        cpu.search.time_limit = time_limit
+    return cpu
+
+
+# Choose the move of a session's CPU player of a level on a serialized grid in a worker process
+# Return tuple with row and column
+def worker_move(session_id, grid_data, level, symbol, time_limit):
+    grid = deserialize_grid(grid_data)
+    return worker_cpu(session_id, grid_data[:4], level, symbol, time_limit).select_move(grid)
+
+
+class Session:
+    __slots__ = ("session_id", "grid", "player", "cpu", "finished")
+
+    # Initialize a game between a remote player and a CPU player on a grid
+    def __init__(self, session_id, grid, player, cpu):
+        self.session_id = session_id
+        self.grid = grid
+        self.player = player
+        self.cpu = cpu
+        self.finished = False
+
+
+class GameServer:
+    # Initialize the server's search budget per move, its worker pool, and whether players' records are kept
+    # Records are written by one thread, so that the SQLite file is never written from the event loop
+    def __init__(self, time_limit=1.0, worker_count=1, keep_records=True):
+        self.time_limit = time_limit
+        self.executor = concurrent.futures.ProcessPoolExecutor(worker_count)
+        self.record_executor = concurrent.futures.ThreadPoolExecutor(1)
+        self.keep_records = keep_records
+        self.session_ids = itertools.count()
+
+    # Start a session from the arguments of a NEW command; return session object and the response words
+    async def new_session(self, arguments):
+        if len(arguments) < 6:
+            raise ValueError(HELP)
+        height, width, win_length, gravity_enabled, level, first = (int(argument) for argument in arguments[:6])
+        name = " ".join(arguments[6:]) or "Remote player"
+        if not (Game.MIN_HEIGHT <= height <= Game.MAX_HEIGHT and Game.MIN_WIDTH <= width <= Game.MAX_WIDTH):
+            raise ValueError(f"board must be {Game.MIN_HEIGHT}-{Game.MAX_HEIGHT} by {Game.MIN_WIDTH}-{Game.MAX_WIDTH}")
+        if not Game.MIN_WIN_LENGTH <= win_length <= max(height, width):
+            raise ValueError(f"win length must be {Game.MIN_WIN_LENGTH}-{max(height, width)}")
+        if gravity_enabled not in (0, 1) or first not in (0, 1) or level not in range(len(Game.CPU_LEVELS)):
+            raise ValueError(HELP)
+        player = Player(1, name, Game.SYMBOL_DEFAULTS[0])
+        # Searching levels only need a name and symbol here, since their moves are chosen in the worker pool
+        cpu_name = f"CPU ({Game.CPU_LEVELS[level]})"
+        if Game.CPU_LEVELS[level] in INLINE_LEVELS:
+            cpu = create_cpu(level, cpu_name, Game.SYMBOL_DEFAULTS[1])
+        else:
+            cpu = Player(level, cpu_name, Game.SYMBOL_DEFAULTS[1])
+        session = Session(next(self.session_ids), create_grid(height, width, win_length, gravity_enabled), player, cpu)
+        responses = ["OK"]
+        if first:
+            responses += await self.cpu_turn(session)
+        return session, responses
+
+    # Play the remote player's move from the arguments of a MOVE command and the CPU's reply; return response words
+    # Rows and columns are numbered from 1; the row is ignored on grids with gravity
+    async def play_move(self, session, arguments):
+        if session.finished:
+            raise ValueError("the game has finished; start a new one with NEW")
+        if len(arguments) != 2:
+            raise ValueError(HELP)
+        grid = session.grid
+        row, column = (int(argument) - 1 for argument in arguments)
+        if isinstance(grid, GravityEnabled):
+            legal = column in [position[1] for position in grid.legal_moves()]
+        else:
+            legal = (row, column) in grid.free_cells
+        if not legal:
+            raise ValueError("that cell is not a legal move")
+        row, column = grid.add_symbol(row, column, session.player.symbol)
+        responses = [f"PLACED {row + 1} {column + 1}"]
+        result = await self.result(session, row, column, session.player)
+        if result is not None:
+            return responses + [result]
+        return responses + await self.cpu_turn(session)
+
+    # Choose and play the CPU's move, in the worker pool for searching levels; return the response words
+    async def cpu_turn(self, session):
+        grid = session.grid
+        cpu = session.cpu
+        if Game.CPU_LEVELS[cpu.level] in INLINE_LEVELS:
+            row, column = cpu.select_move(grid)
+        else:
+            loop = asyncio.get_running_loop()
+            row, column = await loop.run_in_executor(self.executor, worker_move, session.session_id, grid.serialize(),
+                                                     cpu.level, cpu.symbol, self.time_limit)
+        row, column = grid.add_symbol(row, column, cpu.symbol)
+        responses = [f"CPU {row + 1} {column + 1}"]
+        result = await self.result(session, row, column, cpu)
+        if result is not None:
+            responses.append(result)
+        return responses
+
+    # Return the END response from the remote player's view if the last move finished the game, or None
+    # The players' records are updated by the record thread when the game finishes
+    async def result(self, session, row_index, column_index, mover):
+        grid = session.grid
+        if grid.has_victory(row_index, column_index, mover.symbol):
+            winner = mover
+        elif grid.is_full():
+            winner = None
+        else:
+            return None
+        session.finished = True
+        outcomes = {}
+        loop = asyncio.get_running_loop()
+        for player in (session.player, session.cpu):
+            outcomes[player] = "tie" if winner is None else "win" if player is winner else "loss"
+            if self.keep_records:
+                await loop.run_in_executor(self.record_executor, player.update_record, outcomes[player])
+        return f"END {RESULTS[outcomes[session.player]]}"
+
+    # Return the BOARD response with the rows of the session's grid separated by '/' and blank cells as '.'
+    def board(self, session):
+        cells = session.grid.cells
+        return "BOARD " + "/".join("".join(cell if cell != " " else "." for cell in row) for row in cells)
+
+    # Answer the commands of one connection, one line each, until it sends QUIT or closes
+    async def handle_connection(self, reader, writer):
+        session = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, *arguments = line.decode(errors="replace").split() or [""]
+                command = command.upper()
+                try:
+                    if command == "NEW":
+                        session, responses = await self.new_session(arguments)
+                    elif command == "QUIT":
+                        writer.write(b"BYE\n")
+                        break
+                    elif session is None:
+                        raise ValueError(HELP)
+                    elif command == "MOVE":
+                        responses = await self.play_move(session, arguments)
+                    elif command == "BOARD":
+                        responses = [self.board(session)]
+                    else:
+                        raise ValueError(HELP)
+                except ValueError as error:
+                    responses = [f"ERROR {error}"]
+                writer.write((" ".join(responses) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # Write pending records in the record thread, which opened the database, and shut down the worker pool
+    def close(self):
+        self.executor.shutdown()
+        if self.keep_records:
+            self.record_executor.submit(Player.RECORD_STORE.close).result()
+        self.record_executor.shutdown()
+
+
+# Serve games until interrupted
+async def serve(server, host, port):
+    tcp_server = await asyncio.start_server(server.handle_connection, host, port)
+    addresses = ", ".join(str(socket.getsockname()) for socket in tcp_server.sockets)
+    print(f"Serving games on {addresses}")
+    async with tcp_server:
+        await tcp_server.serve_forever()
+
+
+# Parse the command line and run the server
+def main():
+    parser = argparse.ArgumentParser(description="Host many games against CPU players over a TCP line protocol.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes for CPU searches")
+    parser.add_argument("--time-limit", type=float, default=1.0, help="search budget per move in seconds")
+    parser.add_argument("--no-records", action="store_true", help="do not keep players' records")
+    arguments = parser.parse_args()
+    server = GameServer(arguments.time_limit, arguments.workers, not arguments.no_records)
+    try:
+        asyncio.run(serve(server, arguments.host, arguments.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+from main import Game, GameRecordWriter, Instrumentation, create_cpu, create_grid
+
+
+# Return the board settings (height, width, win length, gravity) of a preset name or custom values
+def board_settings(mode=None, custom=None):
+    if custom is not None:
+        return tuple(custom)
+    return Game.BOARD_MODES_SETTINGS[Game.BOARD_MODES.index(mode)]
+
+
+# Create two CPU players for the given level names with the given search budget; return list of CPU player objects
+# A node or playout limit replaces the time limit of the levels it applies to, so that their games are reproducible
+def create_players(levels, time_limit=None, worker_count=1, rng=random, node_limit=None, playout_limit=None):
+    players = []
+    for player_index, level in enumerate(levels):
+        player = create_cpu(Game.CPU_LEVELS.index(level), f"Player {player_index + 1} ({level})",
+                            Game.SYMBOL_DEFAULTS[player_index])
+        player.rng = rng
+        player.worker_count = worker_count
+        if time_limit is not None:
+            player.time_limit = time_limit
+            if player.search is not None:
+                player.search.time_limit = time_limit
+        if node_limit is not None and player.search is not None:
+            player.search.node_limit = node_limit
+            player.search.time_limit = float("inf")
+        if playout_limit is not None and hasattr(player, "playout_limit"):
+            player.playout_limit = playout_limit
+            player.time_limit = float("inf")
+        players.append(player)
+    return players
+
+
+# Play one game without console output; return the index of the winning player, or None for a tie, and move count
+def play_game(grid, players, first_player_index):
+    grid.reset()
+    round_count = first_player_index - 1
+    while True:
+        round_count += 1
+        current_player = players[round_count % 2]
+        row, column = grid.add_symbol(*current_player.select_move(grid), current_player.symbol)
+        if grid.has_victory(row, column, current_player.symbol):
+            return round_count % 2, grid.move_count
+        if grid.is_full():
+            return None, grid.move_count
+
+
+# Play a number of games between two CPU levels, writing each game to a record writer if given
+# Games are measured by an instrumentation object if given; yield a dictionary with the result of each game
+def run_games(settings, levels, game_count, seed=None, backend="list", time_limit=None, worker_count=1,
+              game_records=None, instrumentation=None, node_limit=None, playout_limit=None):
+    rng = random.Random(seed)
+    grid = create_grid(*settings, backend)
+    players = create_players(levels, time_limit, worker_count, rng, node_limit, playout_limit)
+    try:
+        for game_index in range(game_count):
+            first_player_index = rng.randint(0, 1)
+            start = time.perf_counter()
+            if instrumentation is not None:
+                instrumentation.start_game(grid, players)
+            winner_index, move_count = play_game(grid, players, first_player_index)
+            if instrumentation is not None:
+                instrumentation.end_game(winner_index)
+            if game_records is not None:
+                game_records.write(grid, players, first_player_index, winner_index)
+            yield {"game": game_index, "board": list(settings), "levels": list(levels),
+                   "first": first_player_index, "winner": winner_index, "moves": move_count,
+                   "seconds": time.perf_counter() - start}
+    finally:
+        for player in players:
+            player.close()
+
+
+# Return the throughput and win, loss, and tie rates of a sequence of game results from the first player's view
+def summarize(results, elapsed):
+    game_count = len(results)
+    move_count = sum(result["moves"] for result in results)
+    wins = sum(result["winner"] == 0 for result in results)
+    losses = sum(result["winner"] == 1 for result in results)
+    ties = game_count - wins - losses
+    return {"games": game_count, "moves": move_count, "seconds": elapsed,
+            "games_per_second": game_count / elapsed if elapsed else 0.0,
+            "moves_per_second": move_count / elapsed if elapsed else 0.0,
+            "win_rate": wins / game_count if game_count else 0.0,
+            "loss_rate": losses / game_count if game_count else 0.0,
+            "tie_rate": ties / game_count if game_count else 0.0}
+
+
+# Parse the command line, stream one JSON line per game, and report the summary when all games are finished
+def main():
+    parser = argparse.ArgumentParser(description="Play CPU against CPU games without console interaction.")
+    parser.add_argument("--levels", nargs=2, choices=Game.CPU_LEVELS, default=["easy", "hard"])
+    board = parser.add_mutually_exclusive_group()
+    board.add_argument("--mode", choices=[mode for mode in Game.BOARD_MODES if mode != "custom"],
+                       default="tic-tac-toe")
+    board.add_argument("--board", type=int, nargs=4, metavar=("HEIGHT", "WIDTH", "WIN_LENGTH", "GRAVITY"))
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--backend", choices=["list", "bitboard", "sparse"], default="list")
+    parser.add_argument("--time-limit", type=float, help="search budget per move in seconds for strong levels")
+    parser.add_argument("--nodes", type=int, help="alpha-beta node limit per move instead of the time limit")
+    parser.add_argument("--playouts", type=int, help="Monte Carlo playout limit per move instead of the time limit")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", default="-", help="file for JSON lines of game results ('-' for stdout)")
+    parser.add_argument("--record", help="file to append the move list of every game to")
+    parser.add_argument("--metrics", help="file to append per-game and cumulative performance metrics to")
+    arguments = parser.parse_args()
+    settings = board_settings(arguments.mode, arguments.board)
+    output = sys.stdout if arguments.output == "-" else open(arguments.output, "w")
+    game_records = GameRecordWriter(arguments.record) if arguments.record else None
+    instrumentation = Instrumentation(arguments.metrics) if arguments.metrics else None
+    if instrumentation is not None:
+        instrumentation.enable()
+    results = []
+    start = time.perf_counter()
+    try:
+        for result in run_games(settings, arguments.levels, arguments.games, arguments.seed, arguments.backend,
+                                arguments.time_limit, arguments.workers, game_records, instrumentation,
+                                arguments.nodes, arguments.playouts):
+            output.write(json.dumps(result) + "\n")
+            results.append(result)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if game_records is not None:
+            game_records.close()
+        if instrumentation is not None:
+            instrumentation.close()
+            instrumentation.disable()
+    print(json.dumps(summarize(results, time.perf_counter() - start)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
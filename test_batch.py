@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from main import Game, create_grid
+
+np = pytest.importorskip("numpy")
+batch = pytest.importorskip("batch")
+
+BOARD_SETTINGS = [(3, 3, 3, 0), (6, 7, 4, 1), (9, 9, 5, 0), (4, 6, 3, 0), (5, 4, 3, 1), (3, 5, 5, 0)]
+BATCH_SIZE = 16
+
+
+# Return grids of random positions for a board, each stopped after a random number of moves or at a win
+def random_positions(settings, rng):
+    positions = []
+    for _ in range(BATCH_SIZE):
+        grid = create_grid(*settings)
+        move_count = rng.randint(0, len(grid.rows) * len(grid.columns))
+        while grid.move_count < move_count:
+            symbol = Game.SYMBOL_DEFAULTS[grid.move_count % 2]
+            row_index, column_index = grid.make_move(*rng.choice(grid.legal_moves()), symbol)
+            if grid.has_victory(row_index, column_index, symbol):
+                break
+        positions.append(grid)
+    return positions
+
+
+# Return a batch holding each of the grids as one of its boards
+def load_batch(settings, positions):
+    batch_grid = batch.BatchGrid(len(positions), *settings)
+    for board_index, grid in enumerate(positions):
+        batch_grid.load_grid(board_index, grid, Game.SYMBOL_DEFAULTS)
+    return batch_grid
+
+
+# The legal moves, winning cells, and victories of a batch match those of the scalar grids loaded into it
+@pytest.mark.parametrize("settings", BOARD_SETTINGS)
+def test_batch_matches_scalar_grids(settings):
+    rng = random.Random(str(settings))
+    for _ in range(5):
+        positions = random_positions(settings, rng)
+        batch_grid = load_batch(settings, positions)
+        legal = batch_grid.legal_mask()
+        assert batch_grid.is_full().tolist() == [grid.is_full() for grid in positions]
+        for player, symbol in enumerate(Game.SYMBOL_DEFAULTS, 1):
+            players = np.full(len(positions), player, dtype=np.int8)
+            winning = batch_grid.winning_cells(players)
+            for board_index, grid in enumerate(positions):
+                assert set(zip(*np.nonzero(legal[board_index]))) == set(grid.legal_moves())
+                assert set(zip(*np.nonzero(winning[board_index]))) == grid.winning_cells(symbol)
+            for row_index in range(batch_grid.row_count):
+                for column_index in range(batch_grid.column_count):
+                    cells = np.full(len(positions), row_index), np.full(len(positions), column_index)
+                    victories = batch_grid.has_victory(*cells, players)
+                    assert victories.tolist() == [grid.has_victory(row_index, column_index, symbol)
+                                                  for grid in positions]
+
+
+# The double threat cells of a batch match the double threat moves of the scalar grids loaded into it
+@pytest.mark.parametrize("settings", BOARD_SETTINGS)
+def test_batch_double_threats_match_scalar_grids(settings):
+    rng = random.Random(str(settings))
+    for _ in range(5):
+        positions = random_positions(settings, rng)
+        batch_grid = load_batch(settings, positions)
+        for player, symbol in enumerate(Game.SYMBOL_DEFAULTS, 1):
+            players = np.full(len(positions), player, dtype=np.int8)
+            double_threats = batch_grid.double_threat_cells(players)
+            for board_index, grid in enumerate(positions):
+                assert set(zip(*np.nonzero(double_threats[board_index]))) == set(grid.double_threat_moves(symbol))
@@ -0,0 +1,185 @@
+import copy
+import random
+
+import pytest
+
+from main import Game, SparseFreeCells, create_grid, zobrist_key
+
+BOARD_SETTINGS = [(3, 3, 3, 0), (6, 7, 4, 1), (9, 9, 5, 0), (4, 6, 3, 0), (5, 4, 3, 1)]
+# Sparse grids do not support gravity, so they are only built for the boards without it
+GRID_SETTINGS = [(settings, backend) for settings in BOARD_SETTINGS for backend in ("list", "bitboard", "sparse")
+                 if not (backend == "sparse" and settings[3])]
+WIN_CHECKS = ["has_victory", "is_horizontal_win", "is_vertical_win", "is_left_diagonal_win", "is_right_diagonal_win"]
+# Each backend keeps some of these attributes, e.g. a sparse grid keeps 'stones' instead of 'cells'
+TRACKED_ATTRIBUTES = ["cells", "stones", "bitboards", "occupied", "move_count", "free_cells", "column_heights",
+                      "candidate_counts", "symbol_counts", "move_stack", "position_hash", "symmetry_hashes",
+                      "line_counts", "line_totals", "open_lines"]
+
+
+# Return a value with the entries of dictionaries that hold no count left out, recursively
+# Counts of symbols that were placed and removed again are kept at zero, so these entries are not part of the state
+def without_zeros(value):
+    if not isinstance(value, dict):
+        return value
+    value = {key: without_zeros(item) for key, item in value.items()}
+    return {key: item for key, item in value.items() if (any(item) if isinstance(item, list) else item)}
+
+
+# Return a deep copy of every attribute a grid maintains as symbols are placed and removed
+# A sparse grid's free cells are a view of its stones, so they are left out
+def snapshot(grid):
+    return {name: without_zeros(copy.deepcopy(getattr(grid, name))) for name in TRACKED_ATTRIBUTES
+            if hasattr(grid, name) and not isinstance(getattr(grid, name), SparseFreeCells)}
+
+
+# Play random moves on a grid until it is full or a symbol wins, calling a check before every move; return grid
+def play_random_game(grid, rng, check=None):
+    while not grid.is_full():
+        if check is not None:
+            check(grid)
+        symbol = Game.SYMBOL_DEFAULTS[grid.move_count % 2]
+        row_index, column_index = grid.make_move(*rng.choice(grid.legal_moves()), symbol)
+        if grid.has_victory(row_index, column_index, symbol):
+            break
+    return grid
+
+
+# Every legal move followed by 'undo_move' restores all of the grid's tracked state
+@pytest.mark.parametrize("settings, backend", GRID_SETTINGS)
+def test_undo_move_restores_state(settings, backend):
+    rng = random.Random(str(settings))
+
+    # Make and undo every legal move of a position and compare the state with the state before
+    def check(grid):
+        before = snapshot(grid)
+        for move in grid.legal_moves():
+            grid.make_move(*move, Game.SYMBOL_DEFAULTS[grid.move_count % 2])
+            grid.undo_move()
+            assert snapshot(grid) == before
+
+    for _ in range(3):
+        play_random_game(create_grid(*settings, backend), rng, check)
+
+
+# Undoing every move of a game returns the grid to the state of a new grid
+@pytest.mark.parametrize("settings, backend", GRID_SETTINGS)
+def test_undo_whole_game_restores_empty_grid(settings, backend):
+    rng = random.Random(str(settings))
+    empty = snapshot(create_grid(*settings, backend))
+    for _ in range(20):
+        grid = play_random_game(create_grid(*settings, backend), rng)
+        while grid.move_stack:
+            grid.undo_move()
+        assert snapshot(grid) == empty
+
+
+# Return the hash of a grid's moves under each of its symmetries, computed from scratch
+def recomputed_hashes(grid):
+    hashes = []
+    for symmetry in grid.symmetries():
+        position_hash = 0
+        for row_index, column_index, symbol in grid.move_stack:
+            position_hash ^= zobrist_key(*grid.transform_cell(row_index, column_index, symmetry), symbol)
+        hashes.append(position_hash)
+    return hashes
+
+
+# The hashes kept by 'make_move' and 'undo_move' match the hashes of the grid's moves computed from scratch
+@pytest.mark.parametrize("settings, backend", GRID_SETTINGS)
+def test_symmetry_hashes_match_recomputed_hashes(settings, backend):
+    rng = random.Random(str(settings))
+
+    # Check the hashes of a position, and again after making and undoing a move
+    def check(grid):
+        assert grid.symmetry_hashes == recomputed_hashes(grid)
+        grid.make_move(*rng.choice(grid.legal_moves()), Game.SYMBOL_DEFAULTS[grid.move_count % 2])
+        assert grid.symmetry_hashes == recomputed_hashes(grid)
+        grid.undo_move()
+        assert grid.symmetry_hashes == recomputed_hashes(grid)
+
+    for _ in range(10):
+        play_random_game(create_grid(*settings, backend), rng, check)
+
+
+# Playing the moves of a game mapped through any symmetry of the grid gives the same canonical hash after every move
+@pytest.mark.parametrize("settings, backend", GRID_SETTINGS)
+def test_canonical_hash_is_unchanged_under_symmetries(settings, backend):
+    rng = random.Random(str(settings))
+    for _ in range(10):
+        moves = play_random_game(create_grid(*settings, backend), rng).move_stack
+        for symmetry in create_grid(*settings, backend).symmetries():
+            grid = create_grid(*settings, backend)
+            symmetric_grid = create_grid(*settings, backend)
+            for row_index, column_index, symbol in moves:
+                grid.make_move(row_index, column_index, symbol)
+                symmetric_grid.make_move(*grid.transform_cell(row_index, column_index, symmetry), symbol)
+                assert symmetric_grid.canonical_hash() == grid.canonical_hash()
+
+
+# Return the lines held only by each symbol, grouped by how many of its symbols they hold, counted from the moves
+def recounted_open_lines(grid):
+    placed = {(row_index, column_index): symbol for row_index, column_index, symbol in grid.move_stack}
+    line_indices = set(line_index for row_index in grid.rows for column_index in grid.columns
+                       for line_index in grid.winning_lines.lines_through((row_index, column_index)))
+    open_lines = {}
+    for line_index in line_indices:
+        symbols = [placed.get(cell) for cell in grid.winning_lines.line_cells(line_index)]
+        placed_symbols = set(symbols) - {None}
+        if len(placed_symbols) == 1:
+            symbol = placed_symbols.pop()
+            open_lines.setdefault(symbol, [set() for _ in range(grid.win_length + 1)])
+            open_lines[symbol][symbols.count(symbol)].add(line_index)
+    return open_lines
+
+
+# The open lines kept by 'make_move' and 'undo_move' match the open lines counted from the grid's moves
+@pytest.mark.parametrize("settings, backend", GRID_SETTINGS)
+def test_open_lines_match_recounted_open_lines(settings, backend):
+    rng = random.Random(str(settings))
+
+    # Check the open lines of a position, and again after making and undoing a move
+    def check(grid):
+        for _ in range(2):
+            assert without_zeros(grid.open_lines) == recounted_open_lines(grid)
+            grid.make_move(*rng.choice(grid.legal_moves()), Game.SYMBOL_DEFAULTS[grid.move_count % 2])
+            assert without_zeros(grid.open_lines) == recounted_open_lines(grid)
+            grid.undo_move()
+
+    for _ in range(10):
+        play_random_game(create_grid(*settings, backend), rng, check)
+
+
+# Bitboard and sparse grids, which find wins, winning cells, and threats differently, match a list grid
+# A sparse grid only offers the blank cells near its symbols as moves, so the moves played are taken from its moves
+@pytest.mark.parametrize("settings, backend", [(settings, backend) for settings, backend in GRID_SETTINGS
+                                               if backend != "list"])
+def test_backend_matches_list_grid(settings, backend):
+    rng = random.Random(str(settings))
+    for _ in range(10):
+        grid = create_grid(*settings)
+        other_grid = create_grid(*settings, backend)
+        while True:
+            for symbol in Game.SYMBOL_DEFAULTS:
+                for row_index in grid.rows:
+                    for column_index in grid.columns:
+                        for method_name in WIN_CHECKS:
+                            assert (getattr(other_grid, method_name)(row_index, column_index, symbol)
+                                    == getattr(grid, method_name)(row_index, column_index, symbol))
+                assert other_grid.winning_cells(symbol) == grid.winning_cells(symbol)
+                assert other_grid.threat_cells(symbol) == grid.threat_cells(symbol)
+            if backend == "bitboard":
+                assert without_zeros(other_grid.open_lines) == without_zeros(grid.open_lines)
+                assert other_grid.cells == grid.cells
+            assert other_grid.is_full() == grid.is_full()
+            assert set(other_grid.legal_moves()) <= set(grid.legal_moves())
+            if grid.is_full():
+                break
+            # Take back a move now and then, so that positions reached through 'undo_move' are compared too
+            if grid.move_stack and rng.random() < 0.2:
+                grid.undo_move()
+                other_grid.undo_move()
+                continue
+            move = rng.choice(other_grid.legal_moves())
+            symbol = Game.SYMBOL_DEFAULTS[grid.move_count % 2]
+            grid.make_move(*move, symbol)
+            other_grid.make_move(*move, symbol)
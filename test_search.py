@@ -0,0 +1,75 @@
+import random
+import time
+
+import pytest
+
+from main import AlphaBetaSearch, Game, TranspositionTable, create_cpu, create_grid
+from simulate import run_games
+
+
+# The perfect level never loses tic-tac-toe, even with one search table kept across games with either first player
+@pytest.mark.parametrize("seed", range(5))
+def test_perfect_never_loses_tic_tac_toe(seed):
+    results = list(run_games((3, 3, 3, 0), ["perfect", "easy"], 200, seed))
+    assert {result["first"] for result in results} == {0, 1}
+    assert not [result for result in results if result["winner"] == 1]
+
+
+# Parallel searches, whose workers reach different depths, still never lose tic-tac-toe
+def test_parallel_perfect_never_loses_tic_tac_toe():
+    results = list(run_games((3, 3, 3, 0), ["perfect", "easy"], 40, 0, time_limit=0.2, worker_count=2))
+    assert not [result for result in results if result["winner"] == 1]
+
+
+# Parallel searches split the node limit between their workers instead of searching without a budget
+def test_parallel_search_keeps_node_limit():
+    grid = create_grid(9, 9, 5, 0)
+    for move, symbol in (((4, 4), "X"), ((4, 5), "O"), ((3, 3), "X")):
+        grid.make_move(*move, symbol)
+    cpu = create_cpu(Game.CPU_LEVELS.index("perfect"), "parallel", "O")
+    cpu.worker_count = 2
+    # The time limit only stops a search that ignores its node limit from running forever
+    cpu.search.time_limit = 60.0
+    cpu.search.node_limit = 500
+    try:
+        start = time.perf_counter()
+        move = cpu.select_move(grid)
+        elapsed = time.perf_counter() - start
+    finally:
+        cpu.close()
+    assert move in grid.legal_moves()
+    assert cpu.search.nodes <= 500
+    assert elapsed < 30.0
+
+
+# Games between node-limited parallel searches finish, with the same results whatever the machine's speed
+def test_parallel_node_limited_games_are_reproducible():
+    games = [list(run_games((6, 7, 4, 1), ["perfect", "perfect"], 2, 0, worker_count=2, node_limit=300))
+             for _ in range(2)]
+    assert [(result["winner"], result["moves"]) for result in games[0]] == [(result["winner"], result["moves"])
+                                                                          for result in games[1]]
+
+
+# A move stored for a position is found in the matching orientation from every position a symmetry maps onto it
+@pytest.mark.parametrize("settings", [(5, 5, 4, 0), (4, 6, 3, 0), (6, 7, 4, 1)])
+def test_table_moves_follow_symmetries(settings):
+    rng = random.Random(str(settings))
+    search = AlphaBetaSearch()
+    for _ in range(50):
+        grid = create_grid(*settings)
+        for _ in range(rng.randint(1, 6)):
+            grid.make_move(*rng.choice(grid.legal_moves()), Game.SYMBOL_DEFAULTS[grid.move_count % 2])
+        # A position that a symmetry maps onto itself has several equally good orientations for its moves
+        if grid.symmetry_hashes.count(grid.canonical_hash()) > 1:
+            continue
+        symbol = Game.SYMBOL_DEFAULTS[grid.move_count % 2]
+        move = rng.choice(grid.legal_moves())
+        search.table.store(search.table_key(grid, symbol), 1, 0, TranspositionTable.EXACT,
+                           search.move_to_table(grid, move))
+        for symmetry in grid.symmetries():
+            symmetric_grid = create_grid(*settings)
+            for row_index, column_index, placed_symbol in grid.move_stack:
+                symmetric_grid.make_move(*grid.transform_cell(row_index, column_index, symmetry), placed_symbol)
+            entry = search.table.probe(search.table_key(symmetric_grid, symbol))
+            assert entry is not None
+            assert search.move_from_table(symmetric_grid, entry[4]) == grid.transform_cell(*move, symmetry)
@@ -0,0 +1,160 @@
+import argparse
+import concurrent.futures
+import itertools
+import json
+import math
+import os
+import random
+
+from main import Game
+from simulate import run_games
+
+
+# Return the seed of a shard derived from the tournament seed and the shard's mode, levels, and index
+def shard_seed(seed, mode, levels, shard_index):
+    return random.Random(f"{seed}:{mode}:{levels[0]}:{levels[1]}:{shard_index}").getrandbits(32)
+
+
+# Return the identifying key of a shard so that completed shards can be skipped when a run is resumed
+# The search budget is part of the key, so that results played with different budgets are never merged
+def shard_key(shard):
+    return (shard["mode"], tuple(shard["levels"]), shard["shard"], shard["games"], shard["seed"],
+            shard.get("nodes"), shard.get("playouts"))
+
+
+# Return a list of every shard of a round-robin tournament between all CPU levels on all preset boards
+# Strong levels are limited by nodes and playouts per move rather than time, so that every shard is reproducible
+def plan_shards(game_count, shard_size, seed, node_limit, playout_limit, levels=None, modes=None):
+    levels = levels or Game.CPU_LEVELS
+    modes = modes or [mode for mode in Game.BOARD_MODES if mode != "custom"]
+    shards = []
+    for mode in modes:
+        for pair in itertools.combinations(levels, 2):
+            for shard_index in range(math.ceil(game_count / shard_size)):
+                shards.append({"mode": mode, "levels": list(pair), "shard": shard_index,
+                               "games": min(shard_size, game_count - shard_index * shard_size),
+                               "seed": shard_seed(seed, mode, pair, shard_index), "nodes": node_limit,
+                               "playouts": playout_limit})
+    return shards
+
+
+# Play every game of a shard in a worker process; return the shard with its win, loss, tie, and move counts
+def play_shard(shard):
+    settings = Game.BOARD_MODES_SETTINGS[Game.BOARD_MODES.index(shard["mode"])]
+    result = dict(shard, wins=0, losses=0, ties=0, moves=0)
+    for game in run_games(settings, shard["levels"], shard["games"], shard["seed"], node_limit=shard["nodes"],
+                          playout_limit=shard["playouts"]):
+        if game["winner"] == 0:
+            result["wins"] += 1
+        elif game["winner"] == 1:
+            result["losses"] += 1
+        else:
+            result["ties"] += 1
+        result["moves"] += game["moves"]
+    return result
+
+
+# Return the completed shards stored in a results file, or an empty list if the file does not exist
+def load_results(path):
+    try:
+        with open(path, "r") as file:
+            return [json.loads(line) for line in file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+# Play every shard that is not in the results file yet, appending each shard to the file as soon as it finishes
+def run_tournament(shards, path, process_count):
+    completed = set(shard_key(result) for result in load_results(path))
+    pending = [shard for shard in shards if shard_key(shard) not in completed]
+    with open(path, "a") as file, concurrent.futures.ProcessPoolExecutor(process_count) as executor:
+        futures = [executor.submit(play_shard, shard) for shard in pending]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                file.write(json.dumps(future.result()) + "\n")
+                file.flush()
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            raise
+    return len(pending)
+
+
+# Return the Wilson score interval of a proportion for the given number of successes and trials
+def wilson_interval(successes, trials, z=1.96):
+    if not trials:
+        return 0.0, 1.0
+    proportion = successes / trials
+    denominator = 1 + z ** 2 / trials
+    centre = (proportion + z ** 2 / (2 * trials)) / denominator
+    margin = z * math.sqrt(proportion * (1 - proportion) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+# Merge shard results into a matrix per mode of each level's wins, games, and win rate interval against each other
+def win_rate_matrix(results):
+    totals = {}
+    for result in results:
+        first_level, second_level = result["levels"]
+        games = result["wins"] + result["losses"] + result["ties"]
+        for row_level, column_level, wins in ((first_level, second_level, result["wins"]),
+                                              (second_level, first_level, result["losses"])):
+            cell = totals.setdefault(result["mode"], {}).setdefault(row_level, {}).setdefault(column_level, [0, 0])
+            cell[0] += wins
+            cell[1] += games
+    matrix = {}
+    for mode, rows in totals.items():
+        for row_level, columns in rows.items():
+            for column_level, (wins, games) in columns.items():
+                low, high = wilson_interval(wins, games)
+                matrix.setdefault(mode, {}).setdefault(row_level, {})[column_level] = {
+                    "wins": wins, "games": games, "win_rate": wins / games if games else 0.0,
+                    "interval": [low, high]}
+    return matrix
+
+
+# Print the win rate matrix of each mode, where each cell is the row level's win rate against the column level
+def display_matrix(matrix, levels):
+    for mode, rows in matrix.items():
+        print(mode)
+        print("\t" + " " * 12 + "".join(f"{level:>24}" for level in levels))
+        for row_level in levels:
+            cells = []
+            for column_level in levels:
+                cell = rows.get(row_level, {}).get(column_level)
+                if cell is None:
+                    cells.append(f"{'-':>24}")
+                else:
+                    low, high = cell["interval"]
+                    cells.append(f"{cell['win_rate']:>8.3f} [{low:.3f}, {high:.3f}]")
+            print(f"\t{row_level:<12}" + "".join(cells))
+
+
+# Parse the command line, play or resume the tournament, and report the win rate matrix
+def main():
+    parser = argparse.ArgumentParser(description="Run a sharded round-robin tournament between CPU levels.")
+    parser.add_argument("--games", type=int, default=1000, help="games per pair of levels on each board")
+    parser.add_argument("--shard-size", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--nodes", type=int, default=2000, help="alpha-beta node limit per move")
+    parser.add_argument("--playouts", type=int, default=200, help="Monte Carlo playout limit per move")
+    parser.add_argument("--levels", nargs="+", choices=Game.CPU_LEVELS, default=Game.CPU_LEVELS)
+    parser.add_argument("--modes", nargs="+", choices=[mode for mode in Game.BOARD_MODES if mode != "custom"])
+    parser.add_argument("--results", default="tournament.jsonl", help="file that stores completed shards")
+    parser.add_argument("--summary", help="file for the win rate matrix as JSON")
+    arguments = parser.parse_args()
+    shards = plan_shards(arguments.games, arguments.shard_size, arguments.seed, arguments.nodes, arguments.playouts,
+                         arguments.levels, arguments.modes)
+    played = run_tournament(shards, arguments.results, arguments.processes)
+    print(f"Played {played} of {len(shards)} shards; the rest were already stored in '{arguments.results}'.")
+    planned = set(shard_key(shard) for shard in shards)
+    matrix = win_rate_matrix([result for result in load_results(arguments.results) if shard_key(result) in planned])
+    display_matrix(matrix, arguments.levels)
+    if arguments.summary:
+        with open(arguments.summary, "w") as file:
+            json.dump(matrix, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()